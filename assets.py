@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from urllib.parse import quote
+import uploads
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Fingerprinted copies of static/ and their compressed variants are written under BUILD_DIR
+STATIC_DIR = "static"
+BUILD_DIR = os.getenv("ASSET_BUILD_DIR", "asset_build")
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+URL_PREFIX = "/assets"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Images and video are already compressed, so only text assets get .br/.gz variants
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+MIN_COMPRESS_BYTES = 1024
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")] if brotli else [("gzip", ".gz")]
+
+# Logical path (e.g. css/website.css) -> fingerprinted path (css/website.3f9c0a1b2d4e.css)
+manifest = {}
+# Fingerprinted path -> {"digest": ..., "encodings": [...]}, used by the static handler
+_built = {}
+
+
+def _write_atomic(path, data):
+    # Several workers may build at once; each writes its own temp file and renames it
+    temp = f"{path}.{uuid.uuid4().hex}.part"
+    with open(temp, "wb") as out:
+        out.write(data)
+    os.replace(temp, path)
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def choose_encoding(accept_encoding, available):
+    # Best of ENCODINGS that the client accepts and we have a variant for, or None
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, *params = part.split(";")
+        # "gzip;q=0" means the client refuses gzip
+        if not any(re.fullmatch(r"q=0(\.0{0,3})?", p.strip().lower()) for p in params):
+            accepted.add(name.strip().lower())
+    for encoding, _ in ENCODINGS:
+        if encoding in available and encoding in accepted:
+            return encoding
+    return None
+
+
+def etag_matches(if_none_match, etag):
+    # Weak comparison as used for If-None-Match: W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _build_one(logical, source):
+    with open(source, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(logical)
+    hashed = f"{stem}.{digest}{ext}"
+    target = os.path.join(BUILD_DIR, hashed)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # The name changes with the content, so an existing file is already correct
+    if not os.path.exists(target):
+        _write_atomic(target, data)
+    encodings = []
+    if ext.lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_BYTES:
+        for encoding, suffix in ENCODINGS:
+            if not os.path.exists(target + suffix):
+                _write_atomic(target + suffix, compress(data, encoding))
+            encodings.append(encoding)
+    return hashed, {"digest": digest, "encodings": encodings}
+
+
+def build():
+    # Fingerprints everything under static/ except user uploads and writes the manifest.
+    # Unchanged files are skipped, so running it on every startup is cheap.
+    new_manifest, new_built = {}, {}
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if root == STATIC_DIR and uploads.UPLOAD_DIR in dirs:
+            dirs.remove(uploads.UPLOAD_DIR)
+        for name in files:
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, STATIC_DIR).replace(os.sep, "/")
+            hashed, entry = _build_one(logical, source)
+            new_manifest[logical] = hashed
+            new_built[hashed] = entry
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    _write_atomic(MANIFEST_PATH, json.dumps({"assets": new_manifest, "built": new_built}, indent=2).encode("utf-8"))
+    manifest.clear()
+    manifest.update(new_manifest)
+    _built.clear()
+    _built.update(new_built)
+    logger.info(f"Built {len(manifest)} static assets")
+
+
+def load():
+    # Reads a manifest written earlier, e.g. by the Docker build; returns False if there is none
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    manifest.clear()
+    manifest.update(data["assets"])
+    _built.clear()
+    _built.update(data["built"])
+    return True
+
+
+def asset_url(path):
+    # Templates call this instead of url_for('static', ...); unknown files fall back to /static
+    hashed = manifest.get(path)
+    if hashed is None:
+        return f"/{STATIC_DIR}/{quote(path)}"
+    return f"{URL_PREFIX}/{quote(hashed)}"
+
+
+def resolve(hashed, accept_encoding):
+    # Returns (file path, etag, content encoding or None), or None for an unknown asset.
+    # Each encoding is a separate representation, so it gets its own ETag.
+    entry = _built.get(hashed)
+    if entry is None:
+        return None
+    path = os.path.join(BUILD_DIR, hashed)
+    encoding = choose_encoding(accept_encoding, entry["encodings"])
+    if encoding is None:
+        return path, f'"{entry["digest"]}"', None
+    return path + dict(ENCODINGS)[encoding], f'"{entry["digest"]}-{encoding}"', encoding
+
+
+if __name__ == "__main__":
+    # Run during the Docker build so pods start with the assets already fingerprinted
+    logging.basicConfig(level=logging.INFO)
+    build()
@@ -50,6 +50,10 @@ Write-Host ""
 Write-Host "PHASE 3: KUBERNETES DEPLOYMENT" -ForegroundColor Cyan
 Write-Host "Commands to deploy all components to Kubernetes:" -ForegroundColor White
 
+Write-Host ""
+Write-Host "# Create the session signing secret shared by all web replicas (once per cluster)" -ForegroundColor Gray
+Write-Host "kubectl create secret generic webapp-session --from-literal=secret=<random value>" -ForegroundColor Green
+
 Write-Host ""
 Write-Host "# Deploy all components at once" -ForegroundColor Gray
 Write-Host "kubectl apply -f k8s-deploy-all.yaml" -ForegroundColor Green
@@ -0,0 +1,292 @@
+"""
+Offline load test for the FastAPI app.
+
+Seeds a scratch database on a local mongod with synthetic data, drives the real
+ASGI app in-process with concurrent clients and writes per-route latency
+percentiles and throughput to a JSON file that can be compared across commits.
+
+    docker run -d -p 27017:27017 mongo
+    python benchmark.py --scale 1k --seed
+    python benchmark.py --scale 1k --compare bench_results.json --output bench_new.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+# Freelancers at each scale; bookings and notifications match it, queries are a tenth
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+BATCH_SIZE = 10_000
+BENCH_USER = "bench_user"
+BENCH_PASSWORD = "bench-password"
+BENCH_ADMIN = "bench_admin"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the app against a local mongod")
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--seed", action="store_true", help="drop and re-seed the benchmark database first")
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://127.0.0.1:27017"))
+    parser.add_argument("--database", default="Benchmark")
+    parser.add_argument("--requests", type=int, default=500, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--routes", help="comma-separated subset of route names to run")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare p95 latency against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="fail when a route's p95 grows by more than this fraction")
+    return parser.parse_args()
+
+
+def configure(args):
+    # Must run before the app modules are imported, since they read their settings at import
+    if args.database == "Website":
+        sys.exit("Refusing to benchmark against the production database name")
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MONGO_DATABASE"] = args.database
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("SESSION_INSECURE_DEV", "1")
+    os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(max(20, args.concurrency)))
+
+
+async def seed(count):
+    import bcrypt
+    import db
+    import service_registry
+
+    await db.client.drop_database(db.DATABASE_NAME)
+    slugs = list(service_registry.SERVICES)
+    # One hash shared by every seeded account; hashing a million passwords would take hours
+    hashed = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    now = datetime.now(timezone.utc)
+
+    async def insert(collection, make, total):
+        for start in range(0, total, BATCH_SIZE):
+            docs = [make(i) for i in range(start, min(start + BATCH_SIZE, total))]
+            await collection.insert_many(docs, ordered=False)
+
+    def freelancer(i):
+        username = BENCH_USER if i == 0 else f"freelancer{i}"
+        return {
+            "serviceType": slugs[i % len(slugs)],
+            "fullname": f"Freelancer {i}",
+            "username": username,
+            "email": f"{username}@example.com",
+            "hourlyrate": 10 + i % 90,
+            "password": hashed,
+            "profileImage": "images/man.png",
+        }
+
+    def booking(i):
+        # One booking per provider per day, so seeded slots never collide
+        provider = i % count
+        service_date = (date(2026, 1, 1) + timedelta(days=i // count)).isoformat()
+        return {
+            "providerName": f"Freelancer {provider}",
+            "providerUsername": BENCH_USER if provider == 0 else f"freelancer{provider}",
+            "customerName": f"Customer {i}",
+            "customerEmail": f"customer{i}@example.com",
+            "customerPhone": f"0300{i:07d}",
+            "serviceDate": service_date,
+            "serviceTime": "10:00",
+            "additionalNotes": "",
+            **db.booking_window(service_date, "10:00"),
+        }
+
+    def notification(i):
+        # A tenth go to the benchmark user so its feed has real depth
+        provider = 0 if i % 10 == 0 else i % count
+        return {
+            "providerUsername": BENCH_USER if provider == 0 else f"freelancer{provider}",
+            "details": {"customerName": f"Customer {i}", "serviceDate": "2026-01-01", "serviceTime": "10:00"},
+            "read": i % 3 == 0,
+            "createdAt": now,
+        }
+
+    def query(i):
+        return {"name": f"Visitor {i}", "email": f"visitor{i}@example.com", "contact_no": "0300", "message": "Hello"}
+
+    started = time.perf_counter()
+    await insert(db.freelancer_collection, freelancer, count)
+    await insert(db.booking_collection, booking, count)
+    await insert(db.notification_collection, notification, count)
+    await insert(db.query_collection, query, max(1, count // 10))
+    await db.admin_collection.insert_one({"username": BENCH_ADMIN, "password": hashed})
+    print(f"Seeded {count} freelancers in {time.perf_counter() - started:.1f}s")
+
+
+def scenarios(count):
+    # Route name -> function building one request from the client and a request number
+    import service_registry
+    import sessions
+
+    admin_cookie = {"Cookie": f"admin_token={sessions.issue_token(BENCH_ADMIN, 'admin', 3600)}"}
+
+    def user_cookie(username):
+        return {"Cookie": f"user_token={sessions.issue_token(username, 'freelancer', 3600)}"}
+
+    def provider(i):
+        n = random.randrange(count)
+        return BENCH_USER if n == 0 else f"freelancer{n}"
+
+    def slot():
+        # A random far-future slot, so repeated runs rarely hit a 409
+        day = date(2030, 1, 1) + timedelta(days=random.randrange(20_000))
+        return day.isoformat(), f"{random.randrange(9, 17):02d}:00"
+
+    def listing(route):
+        return lambda client, i: client.get(route)
+
+    routes = {f"GET {service.route}": listing(service.route) for service in service_registry.SERVICES.values()}
+    def book(client, i):
+        service_date, service_time = slot()
+        return client.post("/book", json={
+            "providerName": "Benchmark",
+            "providerUsername": provider(i),
+            "customerName": f"Load {i}",
+            "customerEmail": f"load{i}@example.com",
+            "customerPhone": "0300",
+            "serviceDate": service_date,
+            "serviceTime": service_time,
+            "additionalNotes": "",
+        })
+
+    routes["POST /book"] = book
+    routes["GET /availability"] = lambda client, i: client.get(
+        f"/api/freelancers/{provider(i)}/availability", params={"start": "2026-01-01", "end": "2026-01-07"}
+    )
+    routes["POST /login"] = lambda client, i: client.post("/login", json={"username": BENCH_USER, "password": BENCH_PASSWORD})
+    routes["GET /notifications"] = lambda client, i: client.get("/notifications", headers=user_cookie(provider(i)))
+    routes["GET /admin/dashboard"] = lambda client, i: client.get("/admin/dashboard", headers=admin_cookie)
+    return routes
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+async def drive(client, request, total, concurrency):
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            i = issued
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await request(client, i)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else None,
+        "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else None,
+        "p50_ms": 1000 * percentile(latencies, 0.50) if latencies else None,
+        "p95_ms": 1000 * percentile(latencies, 0.95) if latencies else None,
+        "p99_ms": 1000 * percentile(latencies, 0.99) if latencies else None,
+        "max_ms": 1000 * latencies[-1] if latencies else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, max_regression):
+    # Prints p95 changes per route; returns the routes that regressed past the threshold
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressed = []
+    print(f"\np95 vs {baseline_path} ({baseline['meta'].get('commit')})")
+    for name, stats in results["routes"].items():
+        before = baseline["routes"].get(name, {}).get("p95_ms")
+        after = stats["p95_ms"]
+        if before is None or after is None:
+            continue
+        change = after / before - 1
+        flag = "  REGRESSION" if change > max_regression else ""
+        print(f"  {name:28} {before:9.1f} -> {after:9.1f} ms  {change:+.0%}{flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+async def run(args):
+    configure(args)
+    import httpx
+    import db
+    import main
+
+    count = SCALES[args.scale]
+    if args.seed:
+        db.connect()
+        try:
+            await seed(count)
+        finally:
+            db.close()
+
+    routes = scenarios(count)
+    if args.routes:
+        wanted = {name.strip() for name in args.routes.split(",")}
+        routes = {name: request for name, request in routes.items() if name in wanted}
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "scale": args.scale,
+            "requests_per_route": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+        },
+        "routes": {},
+    }
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, request in routes.items():
+                # One untimed request fills caches and opens connections
+                await request(client, 0)
+                stats = await drive(client, request, args.requests, args.concurrency)
+                results["routes"][name] = stats
+                print(f"{name:28} {stats['rps']:8.1f} req/s  p50 {stats['p50_ms']:8.1f}  "
+                      f"p95 {stats['p95_ms']:8.1f}  p99 {stats['p99_ms']:8.1f} ms  errors {stats['errors']}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -1,337 +1,725 @@
+import asyncio
+import logging
 import motor.motor_asyncio
-import bcrypt
-import random
+import passwords
 import os
+import base64
+import binascii
+import json
+import math
+from datetime import date, datetime, time, timedelta, timezone
 from bson import ObjectId
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from bson.errors import InvalidId
+from cache import TTLCache
+import service_registry
+import logs
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # Use environment variable for MongoDB URI, with fallback to Docker service name
 mongoURI = os.getenv("MONGO_URI", "mongodb://mongodb:27017")
-client = motor.motor_asyncio.AsyncIOMotorClient(mongoURI)
-
-db = client["Website"]
-freelancer_collection = db["Freelancers"]
-booking_collection = db["Customers"]
-admin_collection = db["Admins"]
-query_collection = db["Queries"]
-notification_collection = db["Notifications"]
-
-
+# The benchmark points this at a scratch database
+DATABASE_NAME = os.getenv("MONGO_DATABASE", "Website")
+
+# Connection pool settings, per process. Pods x workers x MONGO_MAX_POOL_SIZE bounds
+# the connections Mongo sees when the HPA scales out.
+CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "2")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+}
+# e.g. "zstd,zlib"; zstd and snappy need their optional packages installed
+if os.getenv("MONGO_COMPRESSORS"):
+    CLIENT_OPTIONS["compressors"] = os.getenv("MONGO_COMPRESSORS")
+
+# Read classes. Logins, admin checks and the reads before a write use the
+# collections below, which read from the primary. Public listings and the admin
+# tables tolerate some lag and read through stale(), which prefers secondaries
+# no more than MONGO_MAX_STALENESS_SECONDS behind (Mongo's minimum is 90).
+if os.getenv("MONGO_STALE_READS", "secondaryPreferred") == "primary":
+    STALE_READ_PREFERENCE = Primary()
+else:
+    STALE_READ_PREFERENCE = SecondaryPreferred(max_staleness=int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "90")))
+
+# Set by connect() from the FastAPI lifespan
+client = None
+db = None
+freelancer_collection = None
+booking_collection = None
+admin_collection = None
+query_collection = None
+notification_collection = None
+_stale_collections = {}
+
+
+def connect():
+    global client, db, freelancer_collection, booking_collection, admin_collection, query_collection, notification_collection
+    client = motor.motor_asyncio.AsyncIOMotorClient(mongoURI, **CLIENT_OPTIONS)
+    db = client[DATABASE_NAME]
+    freelancer_collection = db["Freelancers"]
+    booking_collection = db["Customers"]
+    admin_collection = db["Admins"]
+    query_collection = db["Queries"]
+    notification_collection = db["Notifications"]
+    _stale_collections.clear()
+    for collection in (freelancer_collection, booking_collection, admin_collection, query_collection):
+        _stale_collections[collection.name] = collection.with_options(read_preference=STALE_READ_PREFERENCE)
+
+
+def stale(collection):
+    # The handle for stale-tolerant reads of one of the collections above
+    return _stale_collections[collection.name]
+
+
+async def warm_up():
+    # Opens minPoolSize connections before the first request, so it skips the TCP and
+    # handshake cost. Concurrent pings each need their own pooled connection.
+    await client.admin.command("ping")
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(CLIENT_OPTIONS["minPoolSize"])))
+    logger.info(f"Mongo pool warmed with {CLIENT_OPTIONS['minPoolSize']} connections")
+
+
+def close():
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+# Category listings keyed by service type, invalidated by the freelancer writes below
+listing_cache = TTLCache(
+    maxsize=int(os.getenv("LISTING_CACHE_SIZE", "32")),
+    ttl=float(os.getenv("LISTING_CACHE_TTL", "60")),
+)
+
+# Field projections applied by Mongo for each read path
+LISTING_FIELDS = {"_id": 0, "username": 1, "fullname": 1, "serviceType": 1, "hourlyrate": 1, "profileImage": 1}
+FREELANCER_FIELDS = {"password": 0, "confirmPassword": 0}
+ADMIN_FREELANCER_FIELDS = {"username": 1, "fullname": 1, "email": 1, "serviceType": 1, "hourlyrate": 1}
+ADMIN_BOOKING_FIELDS = {"providerName": 1, "customerName": 1, "customerEmail": 1, "customerPhone": 1, "serviceDate": 1, "serviceTime": 1, "additionalNotes": 1}
+ADMIN_QUERY_FIELDS = {"name": 1, "email": 1, "contact_no": 1, "message": 1}
+SEARCH_FIELDS = {"username": 1, "fullname": 1, "serviceType": 1, "hourlyrate": 1, "profileImage": 1}
+NOTIFICATION_FIELDS = {"details": 1, "read": 1}
+ADMIN_FIELDS = {"password": 0}
+
+# Default number of rows per admin table page
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+
+# Default number of notifications returned per feed request
+NOTIFICATION_PAGE_SIZE = int(os.getenv("NOTIFICATION_PAGE_SIZE", "20"))
+# ObjectIds come from each worker's clock and sort by random bytes within a second, so
+# a notification can become visible with an _id below one already returned. Feed polls
+# re-read this many seconds behind the newest notification seen and skip the ids sent.
+NOTIFICATION_OVERLAP_SECONDS = int(os.getenv("NOTIFICATION_OVERLAP_SECONDS", "30"))
+# Bounds the seen-id list a feed cursor can carry
+NOTIFICATION_CURSOR_MAX_IDS = 1000
+
+# Default number of freelancers per search page
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+
+# Default and largest radius for nearest-first lookups, in kilometres
+NEAR_DEFAULT_KM = float(os.getenv("NEAR_DEFAULT_KM", "25"))
+NEAR_MAX_KM = float(os.getenv("NEAR_MAX_KM", "200"))
+# Providers shown on a category page opened with ?lat=..&lng=..
+NEAR_PAGE_SIZE = int(os.getenv("NEAR_PAGE_SIZE", "50"))
+
+# Rows per list in the admin summary view
+ADMIN_SUMMARY_SIZE = int(os.getenv("ADMIN_SUMMARY_SIZE", "10"))
+
+# Bookings start on a slot boundary and last whole slots, so the slots a booking holds
+# are exactly its time range. Times are the provider's wall-clock time, stored without a zone.
+# Not configurable: stored bookings hold slots on this grid, and a different size would
+# let new bookings overlap old ones without sharing a slot. Changing it needs a migration
+# that recomputes every booking's slots.
+BOOKING_SLOT_MINUTES = 30
+BOOKING_DEFAULT_MINUTES = int(os.getenv("BOOKING_DEFAULT_MINUTES", "60"))
+# Also bounds how far back an overlap lookup has to read from the (providerUsername, start) index
+BOOKING_MAX_MINUTES = int(os.getenv("BOOKING_MAX_MINUTES", "480"))
+# Working hours offered by the availability endpoint, and the longest range it returns
+BOOKING_DAY_START = time.fromisoformat(os.getenv("BOOKING_DAY_START", "09:00"))
+BOOKING_DAY_END = time.fromisoformat(os.getenv("BOOKING_DAY_END", "18:00"))
+AVAILABILITY_MAX_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", "31"))
+
+def _on_slot_grid(moment):
+    return moment.second == 0 and moment.microsecond == 0 and moment.minute % BOOKING_SLOT_MINUTES == 0
+
+if BOOKING_DEFAULT_MINUTES % BOOKING_SLOT_MINUTES or BOOKING_MAX_MINUTES % BOOKING_SLOT_MINUTES:
+    raise RuntimeError(f"BOOKING_DEFAULT_MINUTES and BOOKING_MAX_MINUTES must be multiples of {BOOKING_SLOT_MINUTES}")
+if not (_on_slot_grid(BOOKING_DAY_START) and _on_slot_grid(BOOKING_DAY_END)):
+    raise RuntimeError(f"BOOKING_DAY_START and BOOKING_DAY_END must fall on {BOOKING_SLOT_MINUTES}-minute boundaries")
+
+
+@metrics.timed_db
 async def create(data):
     data = dict(data)
     response = await freelancer_collection.insert_one(data)
+    listing_cache.invalidate(data.get("serviceType"))
     return str(response.inserted_id)
 
+def booking_window(service_date, service_time, duration_minutes=None):
+    # Normalized fields for a booking: start, end, duration and the slots it holds
+    duration = BOOKING_DEFAULT_MINUTES if duration_minutes is None else duration_minutes
+    if not 0 < duration <= BOOKING_MAX_MINUTES or duration % BOOKING_SLOT_MINUTES:
+        raise ValueError(f"Duration must be a multiple of {BOOKING_SLOT_MINUTES} minutes, at most {BOOKING_MAX_MINUTES}")
+    try:
+        clock = time.fromisoformat(service_time)
+        start = datetime.combine(date.fromisoformat(service_date), clock)
+    except (TypeError, ValueError):
+        raise ValueError("Service date must be YYYY-MM-DD and time HH:MM")
+    if clock.tzinfo is not None:
+        # Booking times are the provider's wall clock; an offset would mix aware and naive datetimes
+        raise ValueError("Service time must not include a UTC offset")
+    if not _on_slot_grid(clock):
+        # An off-grid start would hold slots beyond its real range, or share none with a booking it overlaps
+        raise ValueError(f"Service time must be on a {BOOKING_SLOT_MINUTES}-minute boundary")
+    end = start + timedelta(minutes=duration)
+    slots = []
+    slot = start
+    while slot < end:
+        slots.append(slot)
+        slot += timedelta(minutes=BOOKING_SLOT_MINUTES)
+    return {"start": start, "end": end, "durationMinutes": duration, "slots": slots}
+
+@metrics.timed_db
 async def create_booking(data):
+    # The unique (providerUsername, slots) index makes the insert itself the conflict
+    # check: it raises DuplicateKeyError when any slot is already held, with one
+    # index lookup per slot and no read-then-write race between concurrent bookings.
     data = dict(data)
+    data.update(booking_window(data["serviceDate"], data["serviceTime"], data.pop("durationMinutes", None)))
     response = await booking_collection.insert_one(data)
     return str(response.inserted_id)
 
+@metrics.timed_db
 async def create_contact_query(data):
     data = dict(data)
     response = await query_collection.insert_one(data)
     return str(response.inserted_id)
 
+@metrics.timed_db
 async def create_notification(data):
+    # createdAt drives the TTL index; new notifications start unread
+    data.setdefault("read", False)
+    data.setdefault("createdAt", datetime.now(timezone.utc))
     response = await notification_collection.insert_one(data)
     return str(response.inserted_id)
 
-async def get_notifications(username):
-    response = notification_collection.find({"providerUsername": username})
+def _encode_feed_cursor(floor, seen):
+    raw = json.dumps([int(floor.timestamp()), sorted(str(i) for i in seen)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_feed_cursor(token):
+    # (the time polls read from, the ids already sent at or after it)
+    try:
+        floor, seen = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if isinstance(floor, bool) or not isinstance(floor, int) or not isinstance(seen, list) or len(seen) > NOTIFICATION_CURSOR_MAX_IDS:
+            raise ValueError
+        return datetime.fromtimestamp(floor, timezone.utc), {ObjectId(i) for i in seen}
+    except (binascii.Error, InvalidId, TypeError, ValueError, OverflowError, OSError):
+        raise ValueError("Invalid page token")
+
+def _advance_feed(floor, seen, ids):
+    seen = seen | set(ids)
+    if seen:
+        floor = max(floor, max(i.generation_time for i in seen) - timedelta(seconds=NOTIFICATION_OVERLAP_SECONDS))
+    seen = sorted(i for i in seen if i.generation_time >= floor)
+    if len(seen) > NOTIFICATION_CURSOR_MAX_IDS:
+        # A burst too large to carry: keep the newest ids and narrow the window to them
+        seen = seen[-NOTIFICATION_CURSOR_MAX_IDS:]
+        floor = seen[0].generation_time
+        seen = [i for i in seen if i.generation_time >= floor]
+    return floor, set(seen)
+
+def new_feed_cursor():
+    # A cursor for a client that has seen nothing yet, starting from now
+    return _encode_feed_cursor(datetime.now(timezone.utc) - timedelta(seconds=NOTIFICATION_OVERLAP_SECONDS), set())
+
+def advance_feed_cursor(token, ids):
+    # Records notifications delivered outside get_notifications, e.g. by the change stream
+    return _encode_feed_cursor(*_advance_feed(*decode_feed_cursor(token), [ObjectId(i) for i in ids]))
+
+def feed_cursor_has(token, object_id):
+    return ObjectId(object_id) in decode_feed_cursor(token)[1]
+
+@metrics.timed_db
+async def get_notifications(username, since=None, limit=NOTIFICATION_PAGE_SIZE, projection=NOTIFICATION_FIELDS):
+    # Without `since` this is the newest `limit` notifications; with it, only the
+    # ones not yet sent after that cursor. Both come back oldest first, with the
+    # cursor to poll from next.
+    query = {"providerUsername": username}
+    if since:
+        floor, seen = decode_feed_cursor(since)
+        query["_id"] = {"$gte": ObjectId.from_datetime(floor)}
+        response = notification_collection.find(query, projection).sort("_id", 1).limit(limit + len(seen))
+        data = [i async for i in response if i["_id"] not in seen][:limit]
+    else:
+        response = notification_collection.find(query, projection).sort("_id", -1).limit(limit)
+        data = [i async for i in response]
+        data.reverse()
+        floor, seen = decode_feed_cursor(new_feed_cursor())
+        if data:
+            floor = data[0]["_id"].generation_time
+    next_token = _encode_feed_cursor(*_advance_feed(floor, seen, [i["_id"] for i in data]))
+    for i in data:
+        i["_id"] = str(i["_id"])
+    return data, next_token
+
+@metrics.timed_db
+async def backfill_notifications():
+    # Notifications stored before read state and TTL expiry existed have neither field,
+    # so they never counted as unread and never expired. Missing createdAt is indexed as
+    # null by createdAt_ttl, so once this has run it is a single empty index lookup.
+    response = await notification_collection.update_many(
+        {"createdAt": None},
+        [{"$set": {"createdAt": {"$toDate": "$_id"}, "read": {"$ifNull": ["$read", False]}}}],
+    )
+    return response.modified_count
+
+@metrics.timed_db
+async def unread_notification_count(username):
+    # Answered from the (providerUsername, read) index without fetching documents
+    return await notification_collection.count_documents({"providerUsername": username, "read": False})
+
+@metrics.timed_db
+async def mark_notifications_read(username, ids=None):
+    query = {"providerUsername": username, "read": False}
+    if ids is not None:
+        try:
+            query["_id"] = {"$in": [ObjectId(i) for i in ids]}
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid notification id")
+    response = await notification_collection.update_many(query, {"$set": {"read": True}})
+    return response.modified_count
+
+
+@metrics.timed_db
+async def all_freelancers(projection=FREELANCER_FIELDS):
+    response = stale(freelancer_collection).find({}, projection)
     data = []
     async for i in response:
         i["_id"] = str(i["_id"])
         data.append(i)
     return data
 
-
-async def all_freelancers():
-    response = freelancer_collection.find({})
+@metrics.timed_db
+async def all_bookings(projection=None):
+    response = stale(booking_collection).find({}, projection)
     data = []
     async for i in response:
         i["_id"] = str(i["_id"])
-        if 'password' in i:
-            del i['password']
         data.append(i)
     return data
 
-async def all_bookings():
-    response = booking_collection.find({})
+@metrics.timed_db
+async def all_queries(projection=None):
+    response = stale(query_collection).find({}, projection)
     data = []
     async for i in response:
         i["_id"] = str(i["_id"])
         data.append(i)
     return data
 
-async def all_queries():
-    response = query_collection.find({})
+def encode_cursor(object_id):
+    # Opaque page token for the last _id of a page
+    return base64.urlsafe_b64encode(ObjectId(object_id).binary).decode().rstrip("=")
+
+def decode_cursor(token):
+    try:
+        return ObjectId(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, InvalidId, TypeError):
+        raise ValueError("Invalid page token")
+
+async def _page(collection, after=None, limit=ADMIN_PAGE_SIZE, projection=None):
+    # Keyset pagination on _id: one extra row tells us whether there is a next page
+    query = {}
+    if after:
+        query["_id"] = {"$gt": decode_cursor(after)}
+    response = collection.find(query, projection).sort("_id", 1).limit(limit + 1)
     data = []
     async for i in response:
-        i["_id"] = str(i["_id"])
         data.append(i)
-    return data
+    next_token = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_token = encode_cursor(data[-1]["_id"])
+    for i in data:
+        i["_id"] = str(i["_id"])
+    return data, next_token
+
+@metrics.timed_db
+async def freelancers_page(after=None, limit=ADMIN_PAGE_SIZE, projection=ADMIN_FREELANCER_FIELDS):
+    return await _page(stale(freelancer_collection), after, limit, projection)
+
+@metrics.timed_db
+async def bookings_page(after=None, limit=ADMIN_PAGE_SIZE, projection=ADMIN_BOOKING_FIELDS):
+    return await _page(stale(booking_collection), after, limit, projection)
+
+@metrics.timed_db
+async def queries_page(after=None, limit=ADMIN_PAGE_SIZE, projection=ADMIN_QUERY_FIELDS):
+    return await _page(stale(query_collection), after, limit, projection)
+
+def _lookup_rows(collection, pipeline):
+    # Runs `pipeline` against another collection inside a $facet branch
+    return [
+        {"$lookup": {"from": collection.name, "pipeline": pipeline, "as": "rows"}},
+        {"$unwind": "$rows"},
+        {"$replaceRoot": {"newRoot": "$rows"}},
+    ]
+
+def _lookup_count(collection, name):
+    return {"$lookup": {"from": collection.name, "pipeline": [{"$count": "n"}], "as": name}}
+
+@metrics.timed_db
+async def dashboard_summary(limit=ADMIN_SUMMARY_SIZE):
+    # One $facet aggregation for the whole admin landing view. It is anchored on a
+    # single Admins document (an admin must exist to log in) and every branch
+    # reads its own collection through $lookup, so the result size is bounded by `limit`.
+    newest = [{"$sort": {"_id": -1}}, {"$limit": limit}]
+    facets = {
+        "serviceTypes": _lookup_rows(freelancer_collection, [
+            {"$group": {"_id": "$serviceType", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ]),
+        "bookingsPerProvider": _lookup_rows(booking_collection, [
+            {"$group": {"_id": "$providerUsername", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": limit},
+        ]),
+        "freelancers": _lookup_rows(freelancer_collection, newest + [{"$project": ADMIN_FREELANCER_FIELDS}]),
+        "bookings": _lookup_rows(booking_collection, newest + [{"$project": ADMIN_BOOKING_FIELDS}]),
+        "queries": _lookup_rows(query_collection, newest + [{"$project": ADMIN_QUERY_FIELDS}]),
+        "totals": [
+            _lookup_count(freelancer_collection, "freelancers"),
+            _lookup_count(booking_collection, "bookings"),
+            _lookup_count(query_collection, "queries"),
+            {"$project": {
+                "_id": 0,
+                "freelancers": {"$ifNull": [{"$arrayElemAt": ["$freelancers.n", 0]}, 0]},
+                "bookings": {"$ifNull": [{"$arrayElemAt": ["$bookings.n", 0]}, 0]},
+                "queries": {"$ifNull": [{"$arrayElemAt": ["$queries.n", 0]}, 0]},
+            }},
+        ],
+    }
+    response = await stale(admin_collection).aggregate([{"$limit": 1}, {"$facet": facets}]).to_list(1)
+    summary = response[0] if response else {name: [] for name in facets}
+    for name in ("freelancers", "bookings", "queries"):
+        for i in summary[name]:
+            i["_id"] = str(i["_id"])
+    summary["totals"] = summary["totals"][0] if summary["totals"] else {"freelancers": 0, "bookings": 0, "queries": 0}
+    return summary
+
+# Columns written by the admin exports, in CSV column order
+EXPORT_FIELDS = {
+    "freelancers": ["_id", "username", "fullname", "email", "serviceType", "hourlyrate", "profileImage"],
+    "bookings": ["_id", "providerName", "providerUsername", "customerName", "customerEmail", "customerPhone", "serviceDate", "serviceTime", "additionalNotes"],
+    "queries": ["_id", "name", "email", "contact_no", "message"],
+}
+
+def _service_date_range(start=None, end=None):
+    # serviceDate is an ISO YYYY-MM-DD string, so string order is date order; both dates are inclusive
+    query = {}
+    if start:
+        query["$gte"] = start.isoformat()
+    if end:
+        query["$lte"] = end.isoformat()
+    return query
+
+def _created_range(start=None, end=None):
+    # Filter on the creation time embedded in _id; both dates are inclusive
+    query = {}
+    if start:
+        query["$gte"] = ObjectId.from_datetime(datetime.combine(start, time.min, tzinfo=timezone.utc))
+    if end:
+        query["$lt"] = ObjectId.from_datetime(datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    return query
+
+async def iter_export(name, service_type=None, start=None, end=None):
+    # start and end select bookings by the date the service is booked for, and
+    # freelancers and queries by when they were created
+    fields = EXPORT_FIELDS[name]
+    query = {}
+    if name == "bookings":
+        dates = _service_date_range(start, end)
+        if dates:
+            query["serviceDate"] = dates
+    else:
+        created = _created_range(start, end)
+        if created:
+            query["_id"] = created
+    if name == "freelancers":
+        collection = stale(freelancer_collection)
+        if service_type:
+            query["serviceType"] = service_type
+    elif name == "bookings":
+        collection = stale(booking_collection)
+        if service_type:
+            providers = await stale(freelancer_collection).distinct("username", {"serviceType": service_type})
+            query["providerUsername"] = {"$in": providers}
+    else:
+        collection = stale(query_collection)
+    response = collection.find(query, {field: 1 for field in fields}, batch_size=500)
+    async for i in response:
+        i["_id"] = str(i["_id"])
+        yield i
 
-async def get_one(username):
-    response = await freelancer_collection.find_one({"username": username})
+@metrics.timed_db
+async def get_one(username, projection=FREELANCER_FIELDS):
+    response = await freelancer_collection.find_one({"username": username}, projection)
     if response:
-        response["_id"] = str(response["_id"])
+        if "_id" in response:
+            response["_id"] = str(response["_id"])
         return response
     else:
         return None
 
+@metrics.timed_db
 async def update(username, data):
     data = dict(data)
+    current = await freelancer_collection.find_one({"username": username}, {"serviceType": 1})
     response = await freelancer_collection.update_one({"username": username}, {"$set": data})
+    if current:
+        listing_cache.invalidate(current.get("serviceType"))
+    if "serviceType" in data:
+        listing_cache.invalidate(data["serviceType"])
     return response.modified_count
 
+@metrics.timed_db
 async def delete(username):
-    response = await freelancer_collection.delete_one({"username": username})
-    return response.deleted_count
+    response = await freelancer_collection.find_one_and_delete({"username": username}, projection={"serviceType": 1})
+    if response is None:
+        return 0
+    listing_cache.invalidate(response.get("serviceType"))
+    return 1
 
+@metrics.timed_db
 async def delete_query(id):
     response = await query_collection.delete_one({"_id": ObjectId(id)})
     return response.deleted_count
 
+@metrics.timed_db
 async def validate_user(username, password):
-    user = await freelancer_collection.find_one({"username": username})
-    if user and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    user = await freelancer_collection.find_one({"username": username}, {"password": 1})
+    if user and await passwords.check_password(password, user['password']):
         return True
     return False
 
+@metrics.timed_db
 async def update_booking(id, data):
+    # Moving a booking re-derives its slots; DuplicateKeyError if the new ones are taken
     data = dict(data)
+    if "serviceDate" in data or "serviceTime" in data:
+        current = await booking_collection.find_one({"_id": ObjectId(id)}, {"serviceDate": 1, "serviceTime": 1, "durationMinutes": 1})
+        if current is None:
+            return 0
+        data.update(booking_window(
+            data.get("serviceDate", current.get("serviceDate")),
+            data.get("serviceTime", current.get("serviceTime")),
+            current.get("durationMinutes"),
+        ))
     response = await booking_collection.update_one({"_id": ObjectId(id)}, {"$set": data})
     return response.modified_count
 
+@metrics.timed_db
 async def delete_booking(id):
     response = await booking_collection.delete_one({"_id": ObjectId(id)})
     return response.deleted_count
 
 # Admin functions
+@metrics.timed_db
 async def create_admin(username, password):
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    admin = {"username": username, "password": hashed_password.decode('utf-8')}
+    hashed_password = await passwords.hash_password(password)
+    admin = {"username": username, "password": hashed_password}
     response = await admin_collection.insert_one(admin)
     return str(response.inserted_id)
 
-async def get_admin(username):
-    response = await admin_collection.find_one({"username": username})
+@metrics.timed_db
+async def get_admin(username, projection=ADMIN_FIELDS):
+    response = await admin_collection.find_one({"username": username}, projection)
     if response:
-        response["_id"] = str(response["_id"])
+        if "_id" in response:
+            response["_id"] = str(response["_id"])
         return response
     else:
         return None
 
+@metrics.timed_db
 async def validate_admin(username, password):
-    admin = await get_admin(username)
-    if admin and bcrypt.checkpw(password.encode('utf-8'), admin['password'].encode('utf-8')):
+    admin = await get_admin(username, {"password": 1})
+    if admin and await passwords.check_password(password, admin['password']):
         return True
     return False
 
-async def get_freelancers_by_service(service_type: str):
-    response = freelancer_collection.find({"serviceType": service_type})
+@metrics.timed_db
+async def get_freelancers_by_service(service_type: str, projection=LISTING_FIELDS):
+    # Only the default listing shape is cached
+    cacheable = projection == LISTING_FIELDS
+    if cacheable:
+        cached = listing_cache.get(service_type)
+        if cached is not None:
+            return cached
+    service = service_registry.get_service(service_type)
+    if service is None:
+        return []
+    # A cache refill reads the primary: a lagging secondary would put a listing the last
+    # write just invalidated back into the cache for its whole TTL
+    collection = freelancer_collection if cacheable else stale(freelancer_collection)
+    response = collection.find({"serviceType": service_type}, projection)
     data = []
-    carWashHeadings = [
-    "Car Wash Expert",
-    "Car Wash Specialist",
-    "Car Wash Professional",
-    "Car Wash Technician",
-    "Car Wash Master"
-] 
-
-    carWashDescriptions = [
-    "I am an expert in car wash services, ensuring your vehicle looks spotless and shiny.",
-    "As a specialist in car wash services, I provide exceptional care tailored to your needs.",
-    "With my professional car wash services, I guarantee a thorough and efficient clean every time.",
-    "As a dedicated technician, I ensure your car receives top-quality wash and care.",
-    "I am a master in car wash services, committed to making your vehicle shine like new."
-] 
-
-    mechanicHeadings = [
-    "Mechanic Expert",
-    "Auto Repair Specialist",
-    "Vehicle Repair Professional",
-    "Car Maintenance Technician",
-    "Automotive Repair Master"
-] 
-
-    mechanicDescriptions = [
-    "I am an expert mechanic dedicated to keeping your vehicle running smoothly.",
-    "As an auto repair specialist, I offer comprehensive services for all vehicle types.",
-    "With my professional repair services, I ensure your vehicle gets reliable and efficient repairs.",
-    "As a car maintenance technician, I provide top-quality service to keep your car in top condition.",
-    "I am a master in automotive repair, committed to delivering the best care for your vehicle."
-] 
-
-    lawnCareHeadings = [
-    "Lawn Care Expert",
-    "Gardening Specialist",
-    "Lawn Maintenance Professional",
-    "Lawn Care Technician",
-    "Lawn Care Master"
-] 
-
-    lawnCareDescriptions = [
-    "I am an expert in lawn care, dedicated to transforming your lawn into a beautiful space.",
-    "As a gardening specialist, I offer comprehensive lawn maintenance solutions.",
-    "With my professional lawn care services, I ensure a healthy and lush lawn all year round.",
-    "As a lawn care technician, I provide top-quality care to keep your lawn well-maintained.",
-    "I am a master in lawn care, committed to creating stunning outdoor spaces for you to enjoy."
-] 
-
-    makeupHeadings = [
-    "Makeup Artist Expert",
-    "Beauty Specialist",
-    "Professional Makeup Artist",
-    "Makeup Technician",
-    "Beauty Master"
-] 
-
-    makeupDescriptions = [
-    "I am an expert makeup artist, here to enhance your beauty for any occasion.",
-    "As a beauty specialist, I provide professional makeup services tailored to your style.",
-    "With my expertise, I ensure you look stunning with flawless makeup applications.",
-    "As a dedicated makeup technician, I offer top-quality makeup services to make you feel beautiful.",
-    "I am a master in makeup artistry, committed to making you look and feel your best."
-] 
-
-    oilChangeHeadings = [
-    "Oil Change Expert",
-    "Lubrication Specialist",
-    "Oil Change Professional",
-    "Oil Change Technician",
-    "Oil Change Master"
-] 
-
-    oilChangeDescriptions = [
-    "I am an expert in oil changes, ensuring your engine runs smoothly and efficiently.",
-    "As a lubrication specialist, I offer quick and reliable oil change services.",
-    "With my professional oil change services, I keep your vehicle in top condition.",
-    "As a dedicated oil change technician, I provide top-quality maintenance for your engine.",
-    "I am a master in oil changes, committed to delivering the best service for your vehicle."
-] 
-
-    personalTrainingHeadings = [
-    "Personal Trainer Expert",
-    "Fitness Specialist",
-    "Professional Personal Trainer",
-    "Fitness Technician",
-    "Personal Training Master"
-] 
-
-    personalTrainingDescriptions = [
-    "I am an expert personal trainer, dedicated to helping you achieve your fitness goals.",
-    "As a fitness specialist, I provide personalized training programs tailored to your needs.",
-    "With my professional guidance, I ensure you stay motivated and reach your fitness milestones.",
-    "As a fitness technician, I offer effective and safe workouts designed for optimal results.",
-    "I am a master in personal training, committed to helping you achieve optimal health and wellness."
-] 
-
-    electricianHeadings = [
-    "Electrician Expert",
-    "Electrical Specialist",
-    "Professional Electrician",
-    "Electrical Technician",
-    "Electrical Master"
-] 
-
-    electricianDescriptions = [
-    "I am an expert electrician, ensuring your electrical systems are safe and efficient.",
-    "As an electrical specialist, I provide comprehensive services for your home or business.",
-    "With my professional electrical services, I guarantee reliable installations and repairs.",
-    "As a dedicated electrical technician, I ensure your systems are up to code and functioning properly.",
-    "I am a master electrician, committed to delivering top-notch electrical solutions for your needs."
-] 
-
-    plumbingHeadings = [
-    "Plumber Expert",
-    "Plumbing Specialist",
-    "Professional Plumber",
-    "Plumbing Technician",
-    "Plumbing Master"
-] 
-
-    plumbingDescriptions = [
-    "I am an expert plumber, here to solve all your plumbing issues efficiently.",
-    "As a plumbing specialist, I provide reliable and comprehensive plumbing services.",
-    "With my professional plumbing services, I ensure high-quality repairs and installations.",
-    "As a dedicated plumbing technician, I keep your plumbing systems functioning smoothly.",
-    "I am a master plumber, committed to delivering top-quality plumbing solutions for your needs."
-] 
-
-    tutorHeadings = [
-    "Tutor Expert",
-    "Education Specialist",
-    "Professional Tutor",
-    "Learning Technician",
-    "Tutoring Master"
-] 
-
-    tutorDescriptions = [
-    "I am an expert tutor, dedicated to enhancing your learning experience.",
-    "As an education specialist, I provide personalized tutoring plans tailored to your needs.",
-    "With my professional tutoring services, I ensure effective and reliable learning sessions.",
-    "As a learning technician, I help you achieve your academic goals with customized lessons.",
-    "I am a master tutor, committed to helping you succeed in your studies with top-quality tutoring."
-] 
-
-    
-    rating = ["⭐⭐⭐⭐⭐", "⭐⭐⭐⭐", "⭐⭐⭐", "⭐⭐" ,"⭐"]
-    
     async for i in response:
-        i["_id"] = str(i["_id"])
-        if 'password' in i:
-            del i['password']
-        if 'email' in i:
-            del i['email']
-        if 'confirmPassword' in i:
-            del i['confirmPassword'] 
-        if '_id' in i:
-            del i['_id']
-        
-        if service_type == "mechanic" :     
-            i['mechanicDescriptions'] = random.choice(mechanicDescriptions)
-            i['rating'] = random.choice(rating)
-            i['mechanicHeadings'] = random.choice(mechanicHeadings)
-            data.append(i)
-        elif service_type == "carwash" :     
-            i['carWashDescriptions'] = random.choice(carWashDescriptions)
-            i['rating'] = random.choice(rating)
-            i['carWashHeadings'] = random.choice(carWashHeadings)
-            data.append(i)    
-        elif service_type == "makeup" :     
-            i['makeupDescriptions'] = random.choice(makeupDescriptions)
-            i['rating'] = random.choice(rating)
-            i['makeupHeadings'] = random.choice(makeupHeadings)
-            data.append(i)
-        elif service_type == "lawncare" :     
-            i['lawnCareDescriptions'] = random.choice(lawnCareDescriptions)
-            i['rating'] = random.choice(rating)
-            i['lawnCareHeadings'] = random.choice(lawnCareHeadings)
-            data.append(i)        
-        elif service_type == "oilchange" :     
-            i['oilChangeDescriptions'] = random.choice(oilChangeDescriptions)
-            i['rating'] = random.choice(rating)
-            i['oilChangeHeadings'] = random.choice(oilChangeHeadings)
-            data.append(i)    
-        elif service_type == "trainer" :     
-            i['personalTrainingDescriptions'] = random.choice(personalTrainingDescriptions)
-            i['rating'] = random.choice(rating)
-            i['personalTrainingHeadings'] = random.choice(personalTrainingHeadings)
-            data.append(i)
-        elif service_type == "plumbing" :     
-            i['plumbingDescriptions'] = random.choice(plumbingDescriptions)
-            i['rating'] = random.choice(rating)
-            i['plumbingHeadings'] = random.choice(plumbingHeadings)
-            data.append(i)    
-        elif service_type == "electrician" :     
-            i['electricianDescriptions'] = random.choice(electricianDescriptions)
-            i['rating'] = random.choice(rating)
-            i['electricianHeadings'] = random.choice(electricianHeadings)
-            data.append(i)    
-        elif service_type == "tutor" :     
-            i['tutorDescriptions'] = random.choice(tutorDescriptions)
-            i['rating'] = random.choice(rating)
-            i['tutorHeadings'] = random.choice(tutorHeadings)
-            data.append(i)    
-    print(data)  # Log the fetched data
+        i.update(service_registry.persona(service, i.get("username", "")))
+        data.append(i)
+    logs.debug_event(logger, "listing.fetched", service=service_type, count=len(data))
+    if cacheable:
+        listing_cache.set(service_type, data)
     return data
+
+def encode_search_cursor(value, object_id):
+    # Keyset cursor for a (sort value, _id) order
+    raw = json.dumps([value, str(object_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_search_cursor(token):
+    # The sort value is compared with rates and used as a $geoNear distance, so it must be a number
+    try:
+        value, object_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        object_id = ObjectId(object_id)
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise ValueError("Invalid page token")
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError("Invalid page token")
+    return value, object_id
+
+@metrics.timed_db
+async def search_freelancers(service_type=None, min_rate=None, max_rate=None, text=None, sort="rate_asc", after=None, limit=SEARCH_PAGE_SIZE):
+    # Keyset-paginated on (hourlyrate, _id). Every shape is pinned to an index:
+    # $text can only run on the text index, and the others are hinted.
+    if sort not in ("rate_asc", "rate_desc"):
+        raise ValueError("Sort must be rate_asc or rate_desc")
+    if service_type is not None and service_registry.get_service(service_type) is None:
+        raise ValueError("Unknown service type")
+    if min_rate is not None and max_rate is not None and min_rate > max_rate:
+        raise ValueError("min_rate cannot be greater than max_rate")
+    direction = 1 if sort == "rate_asc" else -1
+    query = {}
+    if service_type is not None:
+        query["serviceType"] = service_type
+    # A listing without a numeric rate would end a page with a cursor no later page can
+    # resume from, and sorts apart from the numbers anyway; such listings are not searchable
+    rate = {"$type": "number"}
+    if min_rate is not None:
+        rate["$gte"] = min_rate
+    if max_rate is not None:
+        rate["$lte"] = max_rate
+    if after:
+        last_rate, last_id = decode_search_cursor(after)
+        # Narrowing the range keeps the index scan starting at the cursor;
+        # the $or then skips the rows with the same rate already returned
+        if direction == 1:
+            rate["$gte"] = max(rate.get("$gte", last_rate), last_rate)
+        else:
+            rate["$lte"] = min(rate.get("$lte", last_rate), last_rate)
+        beyond = "$gt" if direction == 1 else "$lt"
+        query["$or"] = [
+            {"hourlyrate": {beyond: last_rate}},
+            {"_id": {beyond: last_id}},
+        ]
+    query["hourlyrate"] = rate
+    if text:
+        query["$text"] = {"$search": text}
+    response = stale(freelancer_collection).find(query, SEARCH_FIELDS).sort([("hourlyrate", direction), ("_id", direction)]).limit(limit + 1)
+    if not text:
+        response = response.hint("serviceType_hourlyrate" if service_type is not None else "hourlyrate_id")
+    data = []
+    async for i in response:
+        data.append(i)
+    next_token = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_token = encode_search_cursor(data[-1].get("hourlyrate"), data[-1]["_id"])
+    for i in data:
+        del i["_id"]
+    return data, next_token
+
+def location_point(latitude, longitude):
+    # GeoJSON point for the 2dsphere index; both coordinates or neither
+    if latitude is None and longitude is None:
+        return None
+    if latitude is None or longitude is None:
+        raise ValueError("Latitude and longitude must be given together")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Latitude or longitude out of range")
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+@metrics.timed_db
+async def nearby_freelancers(latitude, longitude, service_type=None, max_km=NEAR_DEFAULT_KM, after=None, limit=SEARCH_PAGE_SIZE):
+    # Nearest first within max_km, paginated on (distance, _id). $geoNear only reads
+    # points inside the radius, so the cost follows local density, not catalogue size.
+    if not 0 < max_km <= NEAR_MAX_KM:
+        raise ValueError(f"max_km must be between 0 and {NEAR_MAX_KM}")
+    if service_type is not None and service_registry.get_service(service_type) is None:
+        raise ValueError("Unknown service type")
+    geo_near = {
+        "near": location_point(latitude, longitude),
+        "distanceField": "distance",
+        "maxDistance": max_km * 1000,
+        "key": "location",
+        "spherical": True,
+    }
+    if service_type is not None:
+        geo_near["query"] = {"serviceType": service_type}
+    pipeline = [{"$geoNear": geo_near}]
+    if after:
+        last_distance, last_id = decode_search_cursor(after)
+        geo_near["minDistance"] = last_distance
+        pipeline.append({"$match": {"$or": [{"distance": {"$gt": last_distance}}, {"_id": {"$gt": last_id}}]}})
+    pipeline += [
+        {"$sort": {"distance": 1, "_id": 1}},
+        {"$limit": limit + 1},
+        {"$project": {**SEARCH_FIELDS, "distance": 1}},
+    ]
+    data = await stale(freelancer_collection).aggregate(pipeline).to_list(limit + 1)
+    next_token = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_token = encode_search_cursor(data[-1]["distance"], data[-1]["_id"])
+    for i in data:
+        del i["_id"]
+        i["distance_km"] = round(i.pop("distance") / 1000, 2)
+    return data, next_token
+
+@metrics.timed_db
+async def provider_availability(username, start_date, end_date):
+    # Free slots within working hours for each day from start_date to end_date.
+    # Bookings are capped at BOOKING_MAX_MINUTES, so any that overlap the range
+    # started at most that long before it: the read is one bounded index range.
+    if end_date < start_date:
+        raise ValueError("End date cannot be before start date")
+    if (end_date - start_date).days >= AVAILABILITY_MAX_DAYS:
+        raise ValueError(f"Range cannot exceed {AVAILABILITY_MAX_DAYS} days")
+    range_start = datetime.combine(start_date, time.min)
+    range_end = datetime.combine(end_date + timedelta(days=1), time.min)
+    query = {
+        "providerUsername": username,
+        "start": {"$gt": range_start - timedelta(minutes=BOOKING_MAX_MINUTES), "$lt": range_end},
+    }
+    busy = set()
+    async for booking in booking_collection.find(query, {"_id": 0, "slots": 1}).hint("providerUsername_start"):
+        busy.update(booking.get("slots", []))
+    days = []
+    day = start_date
+    while day <= end_date:
+        slot = datetime.combine(day, BOOKING_DAY_START)
+        closing = datetime.combine(day, BOOKING_DAY_END)
+        free = []
+        while slot + timedelta(minutes=BOOKING_SLOT_MINUTES) <= closing:
+            if slot not in busy:
+                free.append(slot.strftime("%H:%M"))
+            slot += timedelta(minutes=BOOKING_SLOT_MINUTES)
+        days.append({"date": day.isoformat(), "slots": free})
+        day += timedelta(days=1)
+    return days
@@ -46,6 +46,20 @@ kubectl apply -f k8s-mongodb-service.yaml
 Write-Host "Waiting for MongoDB to be ready..." -ForegroundColor Cyan
 kubectl wait --for=condition=available --timeout=300s deployment/mongodb-deployment
 
+# Session signing secret, shared by all web replicas; kept if it already exists
+Write-Host "Ensuring session secret..." -ForegroundColor Cyan
+kubectl get secret webapp-session 2>$null | Out-Null
+if ($LASTEXITCODE -ne 0) {
+    $bytes = New-Object byte[] 32
+    [System.Security.Cryptography.RandomNumberGenerator]::Create().GetBytes($bytes)
+    $sessionSecret = [Convert]::ToBase64String($bytes)
+    kubectl create secret generic webapp-session --from-literal=secret=$sessionSecret
+    if ($LASTEXITCODE -ne 0) {
+        Write-Host "Failed to create the webapp-session secret." -ForegroundColor Red
+        exit 1
+    }
+}
+
 # Deploy Web Application
 Write-Host "Deploying Web Application..." -ForegroundColor Cyan
 kubectl apply -f k8s-webapp-deployment.yaml
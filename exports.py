@@ -0,0 +1,21 @@
+import csv
+import io
+import json
+
+
+async def ndjson_rows(docs):
+    async for doc in docs:
+        yield json.dumps(doc, default=str) + "\n"
+
+
+async def csv_rows(docs, fields):
+    # Reuse one buffer and emit each row as soon as it is written
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+    async for doc in docs:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(doc)
+        yield buffer.getvalue()
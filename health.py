@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import os
+import time
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+PING_INTERVAL = float(os.getenv("HEALTH_PING_INTERVAL", "5"))
+PING_TIMEOUT = float(os.getenv("HEALTH_PING_TIMEOUT", "2"))
+# A result older than this means the pinger itself is stuck
+STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", str(3 * PING_INTERVAL)))
+# The pod's preStop hook creates this file so readiness fails before SIGTERM arrives
+DRAIN_FILE = os.getenv("DRAIN_FILE", "/tmp/draining")
+
+mongo_ok = False
+last_ping = None
+last_error = None
+draining = False
+
+
+async def ping_loop(client):
+    # Probes read the last result; only this task talks to Mongo
+    global mongo_ok, last_ping, last_error
+    while True:
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), PING_TIMEOUT)
+        except (PyMongoError, asyncio.TimeoutError) as e:
+            if mongo_ok or last_ping is None:
+                logger.warning(f"Mongo ping failed: {e!r}")
+            mongo_ok, last_error = False, repr(e)
+        else:
+            if not mongo_ok and last_ping is not None:
+                logger.info("Mongo ping recovered")
+            mongo_ok, last_error = True, None
+        last_ping = time.monotonic()
+        await asyncio.sleep(PING_INTERVAL)
+
+
+def readiness():
+    # Returns (ready, details) from the cached ping result
+    age = None if last_ping is None else time.monotonic() - last_ping
+    is_draining = draining or os.path.exists(DRAIN_FILE)
+    ready = mongo_ok and age is not None and age <= STALE_AFTER and not is_draining
+    return ready, {
+        "ready": ready,
+        "mongo": mongo_ok,
+        "ping_age_seconds": age,
+        "error": last_error,
+        "draining": is_draining,
+    }
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from markupsafe import Markup
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Originals are read from static/; resized copies are written under CACHE_DIR
+STATIC_DIR = "static"
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+URL_PREFIX = "/img"
+WIDTHS = (320, 640, 1280)
+SOURCE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+CACHE_CONTROL = f"public, max-age={int(os.getenv('IMAGE_MAX_AGE', str(24 * 60 * 60)))}"
+
+# Output format by URL suffix: Pillow encoder, media type and encoder options
+FORMATS = {
+    "jpg": ("JPEG", "image/jpeg", {"quality": 78, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", "image/webp", {"quality": 75, "method": 4}),
+}
+# AVIF needs a Pillow build with libavif (11.3 or later)
+if "avif" in features.modules and features.check_module("avif"):
+    FORMATS["avif"] = ("AVIF", "image/avif", {"quality": 55})
+
+# Modern formats offered as <source> elements, best first; jpg is the <img> fallback
+PREFERRED_FORMATS = [fmt for fmt in ("avif", "webp") if fmt in FORMATS]
+
+# Pillow drops the GIL while it decodes, resizes and encodes, so renders on a
+# couple of threads run alongside request handling instead of stalling it
+POOL_SIZE = int(os.getenv("IMAGE_POOL_SIZE", str(min(2, os.cpu_count() or 1))))
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="images")
+
+
+class UnreadableImage(Exception):
+    # The original exists but Pillow cannot decode it, or it is a decompression bomb
+    pass
+
+
+def _source_path(path):
+    # Resolves a static-relative path, refusing anything outside static/ or not an image
+    path = os.path.normpath(path).replace(os.sep, "/")
+    if path.startswith(("../", "/")) or path == ".." or os.path.splitext(path)[1].lower() not in SOURCE_EXTENSIONS:
+        raise ValueError("Not a static image")
+    return path, os.path.join(STATIC_DIR, path)
+
+
+def _render(source, target, width, fmt):
+    encoder, _, options = FORMATS[fmt]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        if encoder == "JPEG":
+            if image.mode in ("RGBA", "LA", "P"):
+                # JPEG has no alpha channel, so flatten transparent images onto white
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Concurrent renders of the same derivative each write their own file; the last rename wins
+        temp = f"{target}.{uuid.uuid4().hex}.part"
+        try:
+            image.save(temp, encoder, **options)
+            os.replace(temp, target)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+
+def _derivative(path, width, fmt):
+    path, source = _source_path(path)
+    if width not in WIDTHS or fmt not in FORMATS:
+        raise ValueError("Unsupported image size or format")
+    target = os.path.join(CACHE_DIR, str(width), f"{path}.{fmt}")
+    source_mtime = os.stat(source).st_mtime
+    # Bundled originals can be replaced in place, so a derivative older than its source is redone
+    if not os.path.exists(target) or os.stat(target).st_mtime < source_mtime:
+        try:
+            _render(source, target, width, fmt)
+        except (Image.DecompressionBombError, SyntaxError) as e:
+            raise UnreadableImage(str(e)) from e
+        except OSError as e:
+            # Pillow's decode errors (UnidentifiedImageError, truncated files) carry no errno;
+            # filesystem errors do, and stay OSErrors
+            if e.errno is None:
+                raise UnreadableImage(str(e)) from e
+            raise
+    return target
+
+
+async def derivative(path, width, fmt):
+    # Returns the file path of the resized image, rendering it on first use. Raises
+    # ValueError for a bad request, FileNotFoundError for a missing original and
+    # UnreadableImage for one that cannot be decoded.
+    return await asyncio.get_running_loop().run_in_executor(_executor, _derivative, path, width, fmt)
+
+
+async def pregenerate(path):
+    for width in WIDTHS:
+        for fmt in FORMATS:
+            try:
+                await derivative(path, width, fmt)
+            except (OSError, ValueError, UnreadableImage) as e:
+                logger.warning(f"Could not render {fmt} {width}w of {path}: {e}")
+                return
+
+
+def media_type(fmt):
+    return FORMATS[fmt][1]
+
+
+def image_url(path, width, fmt="jpg"):
+    return f"{URL_PREFIX}/{width}/{quote(path)}.{fmt}"
+
+
+def srcset(path, fmt="jpg"):
+    return ", ".join(f"{image_url(path, width, fmt)} {width}w" for width in WIDTHS)
+
+
+def picture_sources(path, sizes):
+    # <source> elements for the modern formats this Pillow build can encode
+    return Markup("\n".join(
+        Markup('<source type="{}" srcset="{}" sizes="{}">').format(media_type(fmt), srcset(path, fmt), sizes)
+        for fmt in PREFERRED_FORMATS
+    ))
+
+
+if __name__ == "__main__":
+    # Renders every bundled image ahead of time, e.g. during the Docker build
+    logging.basicConfig(level=logging.INFO)
+    bundled = sorted(
+        f"images/{name}" for name in os.listdir(os.path.join(STATIC_DIR, "images"))
+        if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS
+    )
+
+    async def main():
+        for path in bundled:
+            await pregenerate(path)
+            logger.info(f"Rendered {path}")
+
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+import logging
+import os
+from datetime import datetime
+from pymongo import ASCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Notifications are removed by Mongo's TTL monitor this long after they are created
+NOTIFICATION_TTL_SECONDS = int(os.getenv("NOTIFICATION_TTL_DAYS", "90")) * 24 * 60 * 60
+
+# Indexes required by the queries in db.py, keyed by collection name
+INDEXES = {
+    "Freelancers": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        # Search filters and keyset pages on (hourlyrate, _id), with or without a service type
+        IndexModel([("serviceType", ASCENDING), ("hourlyrate", ASCENDING), ("_id", ASCENDING)], name="serviceType_hourlyrate"),
+        IndexModel([("hourlyrate", ASCENDING), ("_id", ASCENDING)], name="hourlyrate_id"),
+        IndexModel([("fullname", TEXT)], name="fullname_text"),
+        # $geoNear for nearest-first lookups, filtered by service type
+        IndexModel([("location", GEOSPHERE), ("serviceType", ASCENDING)], name="location_2dsphere"),
+    ],
+    "Customers": [
+        # Availability reads a bounded start range per provider
+        IndexModel([("providerUsername", ASCENDING), ("start", ASCENDING)], name="providerUsername_start"),
+        # One entry per held slot, so an overlapping insert fails atomically. Bookings
+        # stored before slots existed are left out rather than colliding on null.
+        IndexModel(
+            [("providerUsername", ASCENDING), ("slots", ASCENDING)],
+            name="providerUsername_slots_unique",
+            unique=True,
+            partialFilterExpression={"slots": {"$exists": True}},
+        ),
+    ],
+    "Admins": [
+        IndexModel([("username", ASCENDING)], name="username"),
+    ],
+    "Notifications": [
+        IndexModel([("providerUsername", ASCENDING), ("_id", ASCENDING)], name="providerUsername_id"),
+        IndexModel([("providerUsername", ASCENDING), ("read", ASCENDING)], name="providerUsername_read"),
+        IndexModel([("createdAt", ASCENDING)], name="createdAt_ttl", expireAfterSeconds=NOTIFICATION_TTL_SECONDS),
+    ],
+}
+
+# Indexes superseded by the ones above, dropped at startup: serviceType is a prefix
+# of serviceType_hourlyrate and providerUsername one of providerUsername_id
+REPLACED_INDEXES = {
+    "Freelancers": ["serviceType"],
+    "Notifications": ["providerUsername"],
+}
+
+# Server error codes for an existing index with the same name or keys but other options
+INDEX_CONFLICT_CODES = (85, 86)
+# ...and for dropping an index, or from a collection, that does not exist
+INDEX_MISSING_CODES = (26, 27)
+
+# Representative filters for the hot read paths, checked with explain() at startup
+HOT_QUERIES = [
+    ("Freelancers", "get_freelancers_by_service", {"serviceType": "carwash"}),
+    ("Freelancers", "get_one", {"username": ""}),
+    ("Freelancers", "search_freelancers", {"serviceType": "carwash", "hourlyrate": {"$type": "number", "$gte": 0}}),
+    ("Freelancers", "search_freelancers", {"hourlyrate": {"$type": "number", "$gte": 0}}),
+    ("Freelancers", "search_freelancers", {"$text": {"$search": "smith"}, "hourlyrate": {"$type": "number"}}),
+    ("Customers", "provider_availability", {"providerUsername": "", "start": {"$gt": datetime(2000, 1, 1), "$lt": datetime(2000, 1, 2)}}),
+    ("Notifications", "get_notifications", {"providerUsername": ""}),
+    ("Notifications", "unread_notification_count", {"providerUsername": "", "read": False}),
+    ("Notifications", "backfill_notifications", {"createdAt": None}),
+    ("Admins", "get_admin", {"username": ""}),
+]
+
+
+async def ensure_indexes(database):
+    # One create_indexes call per index, so a failure (say, duplicate usernames blocking
+    # username_unique) does not keep the collection's other indexes from being built.
+    # Returns the names of the indexes that could not be created.
+    failed = []
+    for collection_name, names in REPLACED_INDEXES.items():
+        for name in names:
+            try:
+                await database[collection_name].drop_index(name)
+                logger.info(f"Dropped replaced index {name} on {collection_name}")
+            except OperationFailure as e:
+                if e.code not in INDEX_MISSING_CODES:
+                    logger.error(f"Could not drop index {name} on {collection_name}: {e}")
+    for collection_name, models in INDEXES.items():
+        for model in models:
+            name = model.document["name"]
+            try:
+                await database[collection_name].create_indexes([model])
+            except OperationFailure as e:
+                if e.code in INDEX_CONFLICT_CODES and "expireAfterSeconds" in model.document:
+                    # A changed TTL is applied in place rather than by rebuilding the index
+                    await _update_ttl(database, collection_name, name, model.document["expireAfterSeconds"])
+                    continue
+                logger.error(f"Could not create index {name} on {collection_name}: {e}")
+                failed.append(name)
+    logger.info(f"Indexes ensured, {len(failed)} failed")
+    return failed
+
+
+async def _update_ttl(database, collection_name, name, seconds):
+    try:
+        await database.command({"collMod": collection_name, "index": {"name": name, "expireAfterSeconds": seconds}})
+        logger.info(f"Set expireAfterSeconds={seconds} on {collection_name}.{name}")
+    except OperationFailure as e:
+        logger.error(f"Could not update the TTL of {name} on {collection_name}: {e}")
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+async def verify_indexes(database):
+    # Returns the names of hot queries whose winning plan is a collection scan
+    scans = []
+    for collection_name, query_name, query in HOT_QUERIES:
+        explain = await database[collection_name].find(query).explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            logger.warning(f"{query_name} runs a COLLSCAN on {collection_name} for {query}")
+            scans.append(query_name)
+    return scans
@@ -0,0 +1,114 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+# Root level, e.g. LOG_LEVEL=DEBUG while investigating
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-logger levels, e.g. LOG_LEVELS="pymongo=WARNING,db=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "pymongo=WARNING")
+# Fraction of records below WARNING kept per logger, e.g. LOG_SAMPLE="pymongo.command=0.01"
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "pymongo.command=0.01,pymongo.connection=0.01")
+# Empty disables the file; the stream handler is always on
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener = None
+
+
+def _parse(setting):
+    pairs = {}
+    for item in setting.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            pairs[name.strip()] = value.strip()
+    return pairs
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps a random fraction of a noisy logger's records; warnings and errors always pass
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        name = record.name
+        while name:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return random.random() < rate
+            name = name.rpartition(".")[0]
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # A full queue drops the record instead of blocking the request that logged it
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup():
+    # Handlers run on a background thread; request code only formats and enqueues
+    global _listener
+    if _listener is not None:
+        return
+    formatter = logging.Formatter(FORMAT)
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter({name: float(rate) for name, rate in _parse(LOG_SAMPLE).items()}))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in _parse(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    # Flushes whatever is still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def after_fork():
+    # Called in each forked worker: the parent's writer thread was not copied
+    global _listener
+    _listener = None
+    setup()
+
+
+def debug_event(logger, event, **fields):
+    # Structured debug line such as "listing.fetched service='carwash' count=3".
+    # The fields are only formatted when DEBUG is enabled for the logger.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(" ".join([event, *(f"{key}={value!r}" for key, value in fields.items())]))
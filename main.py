@@ -1,30 +1,77 @@
-from fastapi import FastAPI, HTTPException, Body, Form, Request, Depends, Cookie, Response, UploadFile, File
+from fastapi import FastAPI, HTTPException, Body, Form, Request, Depends, Cookie, Response, UploadFile, File, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-import bcrypt
+import passwords
+import sessions
+import notifications
+import uploads
+import images
+import assets
+import pages
+import mimetypes
 import uvicorn
 import logging
+import logs
+import metrics
+import asyncio
 import db
-from typing import Optional
-import shutil
+import indexes
+import health
+import service_registry
+import exports
+from datetime import date
+from typing import Optional, List
+from contextlib import asynccontextmanager
+from pymongo.errors import DuplicateKeyError, PyMongoError
 
 #hello world
 # this is ayesha1234
 # this is main.py file
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+logs.setup()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db.connect()
+    try:
+        await db.warm_up()
+    except PyMongoError as e:
+        # Start anyway; /readyz reports unready until the background ping succeeds
+        logger.error(f"Mongo warm-up failed: {e}")
+    try:
+        await asyncio.to_thread(assets.build)
+    except OSError as e:
+        # A read-only filesystem can still use the manifest from the Docker build
+        logger.error(f"Asset build failed: {e}")
+        assets.load()
+    pages.render_all(templates.env)
+    try:
+        await indexes.ensure_indexes(db.db)
+        await indexes.verify_indexes(db.db)
+    except PyMongoError as e:
+        logger.error(f"Index bootstrap failed: {e}")
+    try:
+        backfilled = await db.backfill_notifications()
+        if backfilled:
+            logger.info(f"Backfilled read state and createdAt on {backfilled} notifications")
+    except PyMongoError as e:
+        logger.error(f"Notification backfill failed: {e}")
+    pinger = asyncio.create_task(health.ping_loop(db.client))
+    watcher = None
+    if notifications.USE_CHANGE_STREAM:
+        watcher = asyncio.create_task(notifications.watch(db.notification_collection))
+    yield
+    health.draining = True
+    pinger.cancel()
+    if watcher:
+        watcher.cancel()
+    db.close()
+    logs.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -35,11 +82,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Refuses oversized bodies before the multipart parser spools them
+app.add_middleware(uploads.BodyLimitMiddleware)
+
+# Outermost, so the timings include the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Set up Jinja2 templates
 templates = Jinja2Templates(directory="templates")
+templates.env.globals.update(
+    image_url=images.image_url,
+    srcset=images.srcset,
+    picture_sources=images.picture_sources,
+    asset_url=assets.asset_url
+)
 
 class User(BaseModel):
     username: str
@@ -62,6 +121,7 @@ class Booking(BaseModel):
     customerPhone: str
     serviceDate: str
     serviceTime: str
+    durationMinutes: Optional[int] = None
     additionalNotes: str = None
 
 class ContactQuery(BaseModel):
@@ -70,108 +130,146 @@ class ContactQuery(BaseModel):
     contact_no: str
     message: str
 
+class NotificationRead(BaseModel):
+    ids: Optional[List[str]] = None
+
 class Admin(BaseModel):
     username: str
     password: str
 
+@app.exception_handler(passwords.PoolSaturated)
+async def password_pool_saturated(request: Request, exc: passwords.PoolSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+# Fields returned to the browser after /login, plus the hash needed to check the password
+LOGIN_FIELDS = {"username": 1, "fullname": 1, "email": 1, "serviceType": 1, "hourlyrate": 1, "profileImage": 1, "password": 1}
+
+# Claims carried in the freelancer session token, enough to render the dashboard
+SESSION_CLAIMS = ("username", "fullname", "serviceType")
+
 def get_current_user(admin_token: Optional[str] = Cookie(None)):
-    if not admin_token or admin_token != "admin-token":
+    claims = sessions.verify_token(admin_token, "admin")
+    if not claims:
         raise HTTPException(status_code=403, detail="Not authenticated")
-    return "admin"
+    return claims["sub"]
 
 def get_authenticated_user(user_token: Optional[str] = Cookie(None)):
-    if not user_token:
+    claims = sessions.verify_token(user_token, "freelancer")
+    if not claims:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    return user_token
-
-@app.get('/homepage', response_class= HTMLResponse)
-def index(request: Request):
-    return templates.TemplateResponse("homepage.html", {"request" : request})
-
-@app.get('/homeservices', response_class= HTMLResponse)
-def index(request: Request):
-    return templates.TemplateResponse("homeservices.html", {"request" : request})
-
-@app.get('/automotiveservices', response_class= HTMLResponse)
-def index(request: Request):
-    return templates.TemplateResponse("automotiveservices.html", {"request" : request})
-
-@app.get('/personalservices', response_class= HTMLResponse)
-def index(request: Request):
-    return templates.TemplateResponse("personalservices.html", {"request" : request})
-
-@app.get('/aboutus', response_class= HTMLResponse)
-def index(request: Request):
-    return templates.TemplateResponse("aboutus.html", {"request" : request})
-
-@app.get('/contactus', response_class= HTMLResponse)
-def index(request: Request):
-    return templates.TemplateResponse("contactus.html", {"request" : request})
-
-
-@app.get('/carwash', response_class=HTMLResponse)
-async def carwash(request: Request):
-    freelancers = await db.get_freelancers_by_service("carwash")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("car_wash.html", {"request": request, "freelancers": freelancers})
+    return claims
+
+def static_page(template):
+    async def page(request: Request):
+        body, etag, encoding = pages.get(templates.env, template, request.headers.get("accept-encoding"))
+        headers = {"Cache-Control": pages.CACHE_CONTROL, "ETag": etag, "Vary": "Accept-Encoding"}
+        if assets.etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return HTMLResponse(content=body, headers=headers)
+    return page
+
+# Pages without dynamic data are prerendered, e.g. /homepage or /aboutus
+for route, template in pages.PAGES.items():
+    app.add_api_route(route, static_page(template), methods=["GET"], response_class=HTMLResponse, name=route.lstrip("/"))
+
+@app.get(assets.URL_PREFIX + "/{path:path}")
+async def static_asset(path: str, request: Request):
+    # Fingerprinted files never change, so browsers may cache them for a year without revalidating
+    resolved = assets.resolve(path, request.headers.get("accept-encoding"))
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    file_path, etag, encoding = resolved
+    headers = {"Cache-Control": assets.CACHE_CONTROL, "ETag": etag, "Vary": "Accept-Encoding"}
+    if assets.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(file_path, media_type=mimetypes.guess_type(path)[0] or "application/octet-stream", headers=headers)
+
+@app.get(images.URL_PREFIX + "/{width}/{path:path}")
+async def resized_image(width: int, path: str):
+    # e.g. /img/640/images/carwash.jpg.webp is carwash.jpg scaled to 640px wide as WebP
+    source, _, fmt = path.rpartition(".")
+    try:
+        target = await images.derivative(source, width, fmt)
+    except images.UnreadableImage:
+        raise HTTPException(status_code=415, detail="Image cannot be decoded")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(target, media_type=images.media_type(fmt), headers={"Cache-Control": images.CACHE_CONTROL})
+
+
+def listing_page(service):
+    async def page(request: Request, lat: Optional[float] = None, lng: Optional[float] = None):
+        if lat is not None and lng is not None:
+            # ?lat=..&lng=.. shows the nearest providers instead of the whole category
+            try:
+                freelancers, _ = await db.nearby_freelancers(lat, lng, service.slug, limit=db.NEAR_PAGE_SIZE)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            for freelancer in freelancers:
+                freelancer.update(service_registry.persona(service, freelancer.get("username", "")))
+        else:
+            freelancers = await db.get_freelancers_by_service(service.slug)
+        logs.debug_event(logger, "listing.rendered", service=service.slug, count=len(freelancers))
+        return templates.TemplateResponse(service.template, {"request": request, "freelancers": freelancers})
+    return page
+
+# One listing route per registered service, e.g. /carwash or /carrepair
+for service in service_registry.SERVICES.values():
+    app.add_api_route(service.route, listing_page(service), methods=["GET"], response_class=HTMLResponse, name=service.slug)
 
 @app.get('/test_get_freelancers')
 async def test_get_freelancers():
     freelancers = await db.get_freelancers_by_service("carwash")
     return {"freelancers": freelancers}
 
+@app.get("/api/freelancers/search")
+async def search_freelancers(
+    service_type: Optional[str] = None,
+    min_rate: Optional[int] = Query(None, ge=0),
+    max_rate: Optional[int] = Query(None, ge=0),
+    q: Optional[str] = Query(None, max_length=100),
+    sort: str = "rate_asc",
+    after: Optional[str] = None,
+    limit: int = Query(db.SEARCH_PAGE_SIZE, ge=1, le=100)
+):
+    try:
+        items, next_token = await db.search_freelancers(service_type, min_rate, max_rate, q, sort, after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next": next_token}
+
+@app.get("/api/freelancers/near")
+async def near_freelancers(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    service_type: Optional[str] = None,
+    max_km: float = Query(db.NEAR_DEFAULT_KM, gt=0, le=db.NEAR_MAX_KM),
+    after: Optional[str] = None,
+    limit: int = Query(db.SEARCH_PAGE_SIZE, ge=1, le=100)
+):
+    try:
+        items, next_token = await db.nearby_freelancers(lat, lng, service_type, max_km, after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next": next_token}
 
-@app.get('/carrepair', response_class= HTMLResponse)
-async def carrepair(request: Request):
-    freelancers = await db.get_freelancers_by_service("mechanic")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("mechanic.html", {"request": request, "freelancers": freelancers})
-
-@app.get('/makeup', response_class= HTMLResponse)
-async def makeup(request: Request):
-    freelancers = await db.get_freelancers_by_service("makeup")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("makeup.html", {"request": request, "freelancers": freelancers})
-
-@app.get('/oilchange', response_class= HTMLResponse)
-async def oilchange(request: Request):
-    freelancers = await db.get_freelancers_by_service("oilchange")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("oil_change.html", {"request": request, "freelancers": freelancers})
-
-@app.get('/personaltraining', response_class= HTMLResponse)
-async def carrepair(request: Request):
-    freelancers = await db.get_freelancers_by_service("trainer")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("personal_training.html", {"request": request, "freelancers": freelancers})
-
-@app.get('/plumbing', response_class= HTMLResponse)
-async def plumbing(request: Request):
-    freelancers = await db.get_freelancers_by_service("plumbing")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("plumbing.html", {"request": request, "freelancers": freelancers})
-
-@app.get('/tutor', response_class= HTMLResponse)
-async def carrepair(request: Request):
-    freelancers = await db.get_freelancers_by_service("tutor")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("tutor.html", {"request": request, "freelancers": freelancers})
-
-@app.get('/lawncare', response_class= HTMLResponse)
-async def carrepair(request: Request):
-    freelancers = await db.get_freelancers_by_service("lawncare")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("lawn_care.html", {"request": request, "freelancers": freelancers})
-
-@app.get('/electrician', response_class= HTMLResponse)
-async def electrician(request: Request):
-    freelancers = await db.get_freelancers_by_service("electrician")
-    print(freelancers)  # Log the freelancers data
-    return templates.TemplateResponse("electrician.html", {"request": request, "freelancers": freelancers})
+@app.get("/api/freelancers/{username}/availability")
+async def freelancer_availability(username: str, start: date, end: Optional[date] = None):
+    try:
+        days = await db.provider_availability(username, start, end or start)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"username": username, "slotMinutes": db.BOOKING_SLOT_MINUTES, "days": days}
 
 @app.get('/freelancerDashboard', response_class= HTMLResponse)
-async def index(request: Request, user_token: str = Depends(get_authenticated_user)):
-    user = await db.get_one(user_token)  # Assuming the token is the username
+async def index(request: Request, claims: dict = Depends(get_authenticated_user)):
+    user = {key: claims.get(key) for key in SESSION_CLAIMS}
     return templates.TemplateResponse("freelancer.html", {"request" : request, "user": user})
 
 @app.post("/contactus")
@@ -204,7 +302,8 @@ async def admin_login(username: str = Form(...), password: str = Form(...)):
             </body>
         </html>
         """)
-        response.set_cookie(key="admin_token", value="admin-token", httponly=True)
+        token = sessions.issue_token(username, "admin", sessions.ADMIN_SESSION_MAX_AGE)
+        response.set_cookie(key="admin_token", value=token, httponly=True, max_age=sessions.ADMIN_SESSION_MAX_AGE)
         return response
     else:
         logger.warning("Invalid admin credentials")
@@ -216,18 +315,123 @@ async def logout(response: Response):
     return {"status": "success"}
 
 @app.get("/admin/dashboard", response_class=HTMLResponse)
-async def admin_dashboard(request: Request, current_user: str = Depends(get_current_user)):
+async def admin_dashboard(
+    request: Request,
+    freelancers_after: Optional[str] = None,
+    bookings_after: Optional[str] = None,
+    queries_after: Optional[str] = None,
+    limit: int = Query(db.ADMIN_PAGE_SIZE, ge=1, le=500),
+    view: str = "summary",
+    current_user: str = Depends(get_current_user)
+):
     try:
-        freelancers = await db.all_freelancers()
-        bookings = await db.all_bookings()
-        queries = await db.all_queries()
-        logger.info(f"Freelancers: {freelancers}")
-        logger.info(f"Bookings: {bookings}")
-        return templates.TemplateResponse("admin_dashboard.html", {"request": request, "freelancers": freelancers, "bookings": bookings, "queries": queries})
+        # The landing view is the bounded summary; paging any table switches to the full tables
+        if view == "summary" and not (freelancers_after or bookings_after or queries_after):
+            summary = await db.dashboard_summary()
+            return templates.TemplateResponse("admin_dashboard.html", {
+                "request": request,
+                "summary": summary,
+                "freelancers": summary["freelancers"],
+                "bookings": summary["bookings"],
+                "queries": summary["queries"]
+            })
+        (freelancers, next_freelancers), (bookings, next_bookings), (queries, next_queries) = await asyncio.gather(
+            db.freelancers_page(freelancers_after, limit),
+            db.bookings_page(bookings_after, limit),
+            db.queries_page(queries_after, limit)
+        )
+        logger.debug(f"Dashboard page: {len(freelancers)} freelancers, {len(bookings)} bookings, {len(queries)} queries")
+        return templates.TemplateResponse("admin_dashboard.html", {
+            "request": request,
+            "freelancers": freelancers,
+            "bookings": bookings,
+            "queries": queries,
+            "next_freelancers": next_freelancers,
+            "next_bookings": next_bookings,
+            "next_queries": next_queries
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error loading admin dashboard: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@app.get("/admin/summary")
+async def admin_summary(current_user: str = Depends(get_current_user)):
+    return await db.dashboard_summary()
+
+# Each dashboard table can also be paged on its own
+@app.get("/admin/freelancers")
+async def admin_freelancers(after: Optional[str] = None, limit: int = Query(db.ADMIN_PAGE_SIZE, ge=1, le=500), current_user: str = Depends(get_current_user)):
+    try:
+        items, next_token = await db.freelancers_page(after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next": next_token}
+
+@app.get("/admin/bookings")
+async def admin_bookings(after: Optional[str] = None, limit: int = Query(db.ADMIN_PAGE_SIZE, ge=1, le=500), current_user: str = Depends(get_current_user)):
+    try:
+        items, next_token = await db.bookings_page(after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next": next_token}
+
+@app.get("/admin/queries")
+async def admin_queries(after: Optional[str] = None, limit: int = Query(db.ADMIN_PAGE_SIZE, ge=1, le=500), current_user: str = Depends(get_current_user)):
+    try:
+        items, next_token = await db.queries_page(after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next": next_token}
+
+@app.get("/admin/export/{collection}")
+async def admin_export(
+    collection: str,
+    format: str = "ndjson",
+    service_type: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: str = Depends(get_current_user)
+):
+    # start/end filter bookings on serviceDate, freelancers and queries on creation date
+    if collection not in db.EXPORT_FIELDS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    if collection == "queries" and service_type:
+        raise HTTPException(status_code=400, detail="Queries cannot be filtered by service type")
+    docs = db.iter_export(collection, service_type, start, end)
+    if format == "ndjson":
+        body, media_type = exports.ndjson_rows(docs), "application/x-ndjson"
+    elif format == "csv":
+        body, media_type = exports.csv_rows(docs, db.EXPORT_FIELDS[collection]), "text/csv"
+    else:
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+    headers = {"Content-Disposition": f'attachment; filename="{collection}.{format}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@app.get("/healthz")
+async def healthz():
+    # Liveness: answering at all shows the event loop is responsive
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    ready, details = health.readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=details)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/admin/cache_stats")
+async def admin_cache_stats(current_user: str = Depends(get_current_user)):
+    return db.listing_cache.stats()
+
+@app.get("/admin/password_pool_stats")
+async def admin_password_pool_stats(current_user: str = Depends(get_current_user)):
+    return passwords.stats()
+
 @app.get("/freelancersignup", response_class=HTMLResponse)
 async def get_signup_page(request: Request):
     logger.info("Signup page accessed")
@@ -235,6 +439,7 @@ async def get_signup_page(request: Request):
 
 @app.post("/signup")
 async def signup(
+    background_tasks: BackgroundTasks,
     serviceType: str = Form(...),
     fullname: str = Form(...),
     username: str = Form(...),
@@ -242,43 +447,62 @@ async def signup(
     hourlyrate: int = Form(...),
     password: str = Form(...),
     confirmPassword: str = Form(...),
-    profileImage: UploadFile = File(...)
+    profileImage: UploadFile = File(...),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None)
 ):
     if password != confirmPassword:
         raise HTTPException(status_code=400, detail="Passwords do not match")
+    try:
+        location = db.location_point(latitude, longitude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    existing_user = await db.get_one(username)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already exists")
-
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed_password = await passwords.hash_password(password)
 
-    # Save the image to the static/images directory
-    image_path = f"images/{profileImage.filename}"
-    with open(f"static/{image_path}", "wb") as image_file:
-        shutil.copyfileobj(profileImage.file, image_file)
+    try:
+        image_path = await uploads.save_image(profileImage)
+    except uploads.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Save the relative image path in the database
-    id = await db.create({
+    freelancer = {
         "serviceType": serviceType,
         "fullname": fullname,
         "username": username,
         "email": email,
         "hourlyrate": hourlyrate,
-        "password": hashed_password.decode('utf-8'),
+        "password": hashed_password,
         "profileImage": image_path
-    })
+    }
+    if location:
+        freelancer["location"] = location
+    try:
+        id = await db.create(freelancer)
+    except DuplicateKeyError:
+        # The unique index on Freelancers.username rejects existing usernames
+        raise HTTPException(status_code=400, detail="Username already exists")
+    # Render the listing-card sizes now rather than on the first page view
+    background_tasks.add_task(images.pregenerate, image_path)
     return {"inserted": True, "inserted_id": id}
 
 @app.post("/login")
 async def login(data: User, response: Response):
-    user = await db.get_one(data.username)
-    if user and bcrypt.checkpw(data.password.encode('utf-8'), user['password'].encode('utf-8')):
+    user = await db.get_one(data.username, LOGIN_FIELDS)
+    if user and await passwords.check_password(data.password, user.pop('password')):
+        token = sessions.issue_token(
+            user["username"],
+            "freelancer",
+            sessions.USER_SESSION_MAX_AGE,
+            {key: user.get(key) for key in SESSION_CLAIMS}
+        )
         response.set_cookie(
             key="user_token",
-            value=data.username,
+            value=token,
             httponly=True,
-            max_age=30*24*60*60  # 30 days in seconds
+            max_age=sessions.USER_SESSION_MAX_AGE
         )
         return {"status": "success", "user": user}
     else:
@@ -286,8 +510,14 @@ async def login(data: User, response: Response):
 
 @app.post("/book")
 async def book_service(data: Booking):
-    id = await db.create_booking(data)
-    await db.create_notification({
+    try:
+        id = await db.create_booking(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DuplicateKeyError:
+        # The provider already holds one of the requested slots
+        raise HTTPException(status_code=409, detail="The provider is already booked at that time")
+    notification = {
         "providerUsername": data.providerUsername,
         "details": {
             "providerName": data.providerName,
@@ -298,13 +528,46 @@ async def book_service(data: Booking):
             "serviceTime": data.serviceTime,
             "additionalNotes": data.additionalNotes
         }
-    })
+    }
+    await db.create_notification(notification)
+    notifications.publish_local(notification)
     return {"success": True, "inserted_id": id}
 
 @app.get("/notifications")
-async def get_notifications(username: str):
-    notifications = await db.get_notifications(username)
-    return notifications
+async def get_notifications(since: Optional[str] = None, limit: int = Query(db.NOTIFICATION_PAGE_SIZE, ge=1, le=100), claims: dict = Depends(get_authenticated_user)):
+    # The logged-in freelancer's feed; the details include customer contact info
+    try:
+        items, next_token = await db.get_notifications(claims["sub"], since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next": next_token}
+
+@app.get("/notifications/unread_count")
+async def get_unread_count(claims: dict = Depends(get_authenticated_user)):
+    return {"unread": await db.unread_notification_count(claims["sub"])}
+
+@app.post("/notifications/read")
+async def mark_notifications_read(data: NotificationRead = Body(NotificationRead()), claims: dict = Depends(get_authenticated_user)):
+    # Marks the given notifications read, or all of them when no ids are sent
+    try:
+        updated = await db.mark_notifications_read(claims["sub"], data.ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"updated": updated}
+
+@app.get("/notifications/stream")
+async def stream_notifications(since: Optional[str] = None, claims: dict = Depends(get_authenticated_user)):
+    # Server-Sent Events for the logged-in freelancer's new bookings, after the `since` cursor
+    if since:
+        try:
+            db.decode_feed_cursor(since)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        notifications.event_stream(claims["sub"], since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.delete("/delete")
@@ -346,8 +609,8 @@ async def admin_delete_query(id: str, method_override: str = Form(...), current_
     return {"delete": True}
 
 
-@app.post("/admin.update_freelancer/{username}")
-async def admin_update_freelancer(username: str, fullname: Optional[str] = Form(None), serviceType: Optional[str] = Form(None), email: Optional[str] = Form(None), hourlyrate: Optional[int] = Form(None), method_override: str = Form(...), current_user: str = Depends(get_current_user)):
+@app.post("/admin/update_freelancer/{username}")
+async def admin_update_freelancer(username: str, fullname: Optional[str] = Form(None), serviceType: Optional[str] = Form(None), email: Optional[str] = Form(None), hourlyrate: Optional[int] = Form(None), latitude: Optional[float] = Form(None), longitude: Optional[float] = Form(None), method_override: str = Form(...), current_user: str = Depends(get_current_user)):
     if method_override != "PUT":
         raise HTTPException(status_code=405, detail="Method Not Allowed")
     
@@ -360,6 +623,12 @@ async def admin_update_freelancer(username: str, fullname: Optional[str] = Form(
         update_data['email'] = email
     if hourlyrate is not None:
         update_data['hourlyrate'] = hourlyrate
+    try:
+        location = db.location_point(latitude, longitude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if location is not None:
+        update_data['location'] = location
     
     updated_count = await db.update(username, update_data)
     if updated_count == 0:
@@ -387,7 +656,12 @@ async def admin_update_booking(id: str, providerName: Optional[str] = Form(None)
     if additionalNotes is not None:
         update_data['additionalNotes'] = additionalNotes
     
-    updated_count = await db.update_booking(id, update_data)
+    try:
+        updated_count = await db.update_booking(id, update_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="The provider is already booked at that time")
     if updated_count == 0:
         raise HTTPException(status_code=404, detail="Booking not found")
     return update_data
@@ -0,0 +1,119 @@
+import functools
+import os
+import time
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from starlette.routing import Match
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", multiprocess_mode="livesum")
+# Server-Sent Events connections stay open for minutes or hours, so they are kept out
+# of the two series above and counted here instead
+STREAMS_OPEN = Gauge("http_event_streams_open", "Server-Sent Events connections currently open", multiprocess_mode="livesum")
+
+DB_OPERATIONS = Counter("db_operations_total", "db.py operations by outcome", ["operation", "outcome"])
+DB_LATENCY = Histogram(
+    "db_operation_duration_seconds", "db.py operation latency", ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+PASSWORD_CALLS = Counter("password_calls_total", "bcrypt hash and check calls", ["operation"])
+PASSWORD_REJECTED = Counter("password_rejected_total", "bcrypt calls rejected because the pool was saturated")
+PASSWORD_WAIT = Histogram(
+    "password_queue_wait_seconds", "Time bcrypt calls waited for a pool thread",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PASSWORD_RUN = Histogram(
+    "password_run_seconds", "Time spent inside bcrypt", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2),
+)
+
+
+def render():
+    # Under serve.py every worker writes its samples to PROMETHEUS_MULTIPROC_DIR; add them all up
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def timed_db(fn):
+    # Counts and times a db.py coroutine, labelled by its function name
+    operation = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception:
+            DB_OPERATIONS.labels(operation, "error").inc()
+            raise
+        finally:
+            DB_LATENCY.labels(operation).observe(time.perf_counter() - started)
+        DB_OPERATIONS.labels(operation, "ok").inc()
+        return result
+    return wrapper
+
+
+def _route_template(scope, request_scope):
+    # Label by template (/admin/export/{collection}) so raw paths cannot explode the series count.
+    # FastAPI records the matched route in the scope; mounts like /static are matched here.
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    for route in scope["app"].routes:
+        match, _ = route.matches(request_scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware, so streaming responses are timed to their last byte
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # The router rewrites the scope in place, so keep the request as it arrived
+        request_scope = dict(scope)
+        status = 500
+        streaming = False
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", ())).get(b"content-type", b"")
+                if content_type.startswith(b"text/event-stream"):
+                    # From here on this is a long-lived stream, not a request in flight
+                    streaming = True
+                    IN_FLIGHT.dec()
+                    STREAMS_OPEN.inc()
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if streaming:
+                STREAMS_OPEN.dec()
+            else:
+                IN_FLIGHT.dec()
+            labels = (scope["method"], _route_template(scope, request_scope), str(status))
+            REQUESTS.labels(*labels).inc()
+            if not streaming:
+                REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - started)
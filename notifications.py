@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from pymongo.errors import PyMongoError
+import db
+
+logger = logging.getLogger(__name__)
+
+# Relay new notifications through a Mongo change stream so every replica sees them
+USE_CHANGE_STREAM = os.getenv("NOTIFICATION_CHANGE_STREAM", "").lower() in ("1", "true", "yes")
+QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "100"))
+KEEPALIVE_SECONDS = float(os.getenv("NOTIFICATION_KEEPALIVE", "15"))
+# Without a change stream each connection polls the collection this often, so bookings
+# handled by another replica still arrive; a local publish triggers the poll at once
+POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "5"))
+
+
+class Broker:
+    # In-process pub/sub: one bounded queue per connected client, keyed by provider username
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, username):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[username].add(queue)
+        return queue
+
+    def unsubscribe(self, username, queue):
+        queues = self._subscribers.get(username)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[username]
+
+    def publish(self, username, event):
+        for queue in self._subscribers.get(username, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client that stopped reading misses events rather than growing memory
+                logger.warning(f"Dropping notification for slow subscriber {username}")
+
+    def subscriber_count(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+broker = Broker()
+change_stream_active = False
+
+
+def to_event(doc):
+    return {"_id": str(doc["_id"]), "details": doc.get("details"), "read": doc.get("read", False)}
+
+
+def publish_local(doc):
+    # With a running change stream the watcher publishes instead, on every replica
+    if not change_stream_active:
+        broker.publish(doc["providerUsername"], to_event(doc))
+
+
+async def watch(collection):
+    # Requires a replica set; a single-node one is enough for local development
+    global change_stream_active
+    try:
+        async with collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+            change_stream_active = True
+            logger.info("Relaying notifications from the change stream")
+            async for change in stream:
+                doc = change["fullDocument"]
+                broker.publish(doc["providerUsername"], to_event(doc))
+    except PyMongoError as e:
+        logger.error(f"Notification change stream stopped: {e}")
+    finally:
+        change_stream_active = False
+
+
+async def event_stream(username, since=None):
+    # `since` is the feed cursor the client loaded up to. The stream starts by reading
+    # the database from it, so bookings made before the subscription are not lost.
+    # Then the change stream's events are forwarded, or, without one, polling goes on.
+    queue = broker.subscribe(username)
+    cursor = since or db.new_feed_cursor()
+    loop = asyncio.get_running_loop()
+    last_sent = loop.time()
+    first = True
+    catch_up = True
+    was_polling = False
+    try:
+        while True:
+            event = None
+            if not first:
+                timeout = KEEPALIVE_SECONDS if change_stream_active else POLL_SECONDS
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            first = False
+            streaming = change_stream_active
+            if streaming and was_polling:
+                # The change stream has just started: read up to it before relying on it
+                catch_up = True
+            if streaming and not catch_up:
+                # The catch-up read may already have sent this one
+                events = [event] if event and not db.feed_cursor_has(cursor, event["_id"]) else []
+                if events:
+                    cursor = db.advance_feed_cursor(cursor, [event["_id"]])
+            else:
+                # The database is the source of truth; a local event only woke us early
+                try:
+                    events, cursor = await db.get_notifications(username, since=cursor)
+                    catch_up = False
+                except PyMongoError as e:
+                    logger.warning(f"Notification poll for {username} failed: {e}")
+                    events = []
+            was_polling = not streaming
+            for event in events:
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+                last_sent = loop.time()
+            if loop.time() - last_sent >= KEEPALIVE_SECONDS:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                last_sent = loop.time()
+    finally:
+        broker.unsubscribe(username, queue)
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import assets
+
+# Templates with no per-request data, rendered once and kept as bytes
+PAGES = {
+    "/homepage": "homepage.html",
+    "/homeservices": "homeservices.html",
+    "/automotiveservices": "automotiveservices.html",
+    "/personalservices": "personalservices.html",
+    "/aboutus": "aboutus.html",
+    "/contactus": "contactus.html",
+}
+# Page URLs are not fingerprinted, so browsers revalidate and get a 304 while unchanged
+CACHE_CONTROL = "no-cache"
+
+# Template name -> (template mtime, ETag digest, {encoding or None: body})
+_rendered = {}
+
+
+def _render(env, name, mtime):
+    body = env.get_template(name).render().encode("utf-8")
+    variants = {None: body}
+    for encoding, _ in assets.ENCODINGS:
+        variants[encoding] = assets.compress(body, encoding)
+    entry = (mtime, hashlib.sha256(body).hexdigest()[:16], variants)
+    _rendered[name] = entry
+    return entry
+
+
+def render_all(env):
+    # Called at startup, after the asset manifest the templates link to is built
+    _rendered.clear()
+    for name in PAGES.values():
+        _render(env, name, os.stat(os.path.join(env.loader.searchpath[0], name)).st_mtime)
+
+
+def get(env, name, accept_encoding):
+    # Returns (body, etag, content encoding or None), re-rendering if the template file changed
+    mtime = os.stat(os.path.join(env.loader.searchpath[0], name)).st_mtime
+    entry = _rendered.get(name)
+    if entry is None or entry[0] != mtime:
+        entry = _render(env, name, mtime)
+    _, digest, variants = entry
+    encoding = assets.choose_encoding(accept_encoding, variants)
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+    return variants[encoding], etag, encoding
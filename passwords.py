@@ -0,0 +1,85 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import metrics
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+# Hashes allowed in flight (running + waiting) before new ones are rejected
+QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "64"))
+
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="bcrypt")
+_in_flight = 0
+_stats = {
+    "calls": 0,
+    "rejected": 0,
+    "wait_seconds": 0.0,
+    "run_seconds": 0.0,
+    "max_run_seconds": 0.0,
+    "max_queue_depth": 0,
+}
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+async def _run(fn, *args):
+    global _in_flight
+    if _in_flight >= QUEUE_LIMIT:
+        _stats["rejected"] += 1
+        metrics.PASSWORD_REJECTED.inc()
+        raise PoolSaturated("Password hashing pool is saturated")
+
+    def timed():
+        started = time.perf_counter()
+        result = fn(*args)
+        return result, started, time.perf_counter()
+
+    _in_flight += 1
+    _stats["max_queue_depth"] = max(_stats["max_queue_depth"], _in_flight - POOL_SIZE)
+    submitted = time.perf_counter()
+    try:
+        result, started, finished = await asyncio.get_running_loop().run_in_executor(_executor, timed)
+    finally:
+        _in_flight -= 1
+    _stats["calls"] += 1
+    _stats["wait_seconds"] += started - submitted
+    _stats["run_seconds"] += finished - started
+    _stats["max_run_seconds"] = max(_stats["max_run_seconds"], finished - started)
+    operation = fn.__name__.lstrip("_")
+    metrics.PASSWORD_CALLS.labels(operation).inc()
+    metrics.PASSWORD_WAIT.observe(started - submitted)
+    metrics.PASSWORD_RUN.labels(operation).observe(finished - started)
+    return result
+
+
+def _hash(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+async def hash_password(password):
+    return await _run(_hash, password)
+
+
+async def check_password(password, hashed):
+    return await _run(_check, password, hashed)
+
+
+def stats():
+    calls = _stats["calls"]
+    return {
+        **_stats,
+        "pool_size": POOL_SIZE,
+        "queue_limit": QUEUE_LIMIT,
+        "in_flight": _in_flight,
+        "queue_depth": max(0, _in_flight - POOL_SIZE),
+        "avg_wait_seconds": _stats["wait_seconds"] / calls if calls else 0.0,
+        "avg_run_seconds": _stats["run_seconds"] / calls if calls else 0.0,
+    }
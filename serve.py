@@ -0,0 +1,94 @@
+import math
+import os
+import tempfile
+
+# Production entry point: gunicorn supervising uvicorn workers, one per CPU the
+# container may use. Run with `python serve.py`; `uvicorn main:app` still works for development.
+
+PORT = int(os.getenv("PORT", "8000"))
+# Restart each worker after roughly this many requests to bound memory growth
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "10000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+# Seconds a worker gets to finish in-flight requests after SIGTERM
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "25"))
+
+
+def _cgroup_cpu_limit():
+    # CPUs allowed by the container's quota, or None when there is no limit
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def worker_count():
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def post_fork(server, worker):
+    # The log writer thread does not survive fork, so each worker starts its own
+    import logs
+    logs.after_fork()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def run():
+    from gunicorn.app.base import BaseApplication
+
+    # Workers share the metrics through files; this must be set before prometheus_client is imported
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="prometheus-"))
+    # Several workers rotating one file would race, so log to stderr unless a file is asked for
+    os.environ.setdefault("LOG_FILE", "")
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"0.0.0.0:{PORT}",
+                "workers": worker_count(),
+                # Picks uvloop and httptools when they are installed
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                # Import the app once in the master so workers share its memory copy-on-write
+                "preload_app": True,
+                "max_requests": MAX_REQUESTS,
+                "max_requests_jitter": MAX_REQUESTS_JITTER,
+                "graceful_timeout": GRACEFUL_TIMEOUT,
+                "timeout": 60,
+                "keepalive": 5,
+                "accesslog": None,
+                "post_fork": post_fork,
+                "child_exit": child_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import main
+            return main.app
+
+    Server().run()
+
+
+if __name__ == "__main__":
+    run()
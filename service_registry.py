@@ -0,0 +1,237 @@
+import hashlib
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Service:
+    slug: str
+    route: str
+    template: str
+    heading_key: str
+    description_key: str
+    headings: tuple
+    descriptions: tuple
+
+
+RATINGS = ("⭐⭐⭐⭐⭐", "⭐⭐⭐⭐", "⭐⭐⭐", "⭐⭐", "⭐")
+
+SERVICES = {}
+
+
+def register(service):
+    SERVICES[service.slug] = service
+    return service
+
+
+register(Service(
+    slug="carwash",
+    route="/carwash",
+    template="car_wash.html",
+    heading_key="carWashHeadings",
+    description_key="carWashDescriptions",
+    headings=(
+        "Car Wash Expert",
+        "Car Wash Specialist",
+        "Car Wash Professional",
+        "Car Wash Technician",
+        "Car Wash Master",
+    ),
+    descriptions=(
+        "I am an expert in car wash services, ensuring your vehicle looks spotless and shiny.",
+        "As a specialist in car wash services, I provide exceptional care tailored to your needs.",
+        "With my professional car wash services, I guarantee a thorough and efficient clean every time.",
+        "As a dedicated technician, I ensure your car receives top-quality wash and care.",
+        "I am a master in car wash services, committed to making your vehicle shine like new.",
+    ),
+))
+
+register(Service(
+    slug="mechanic",
+    route="/carrepair",
+    template="mechanic.html",
+    heading_key="mechanicHeadings",
+    description_key="mechanicDescriptions",
+    headings=(
+        "Mechanic Expert",
+        "Auto Repair Specialist",
+        "Vehicle Repair Professional",
+        "Car Maintenance Technician",
+        "Automotive Repair Master",
+    ),
+    descriptions=(
+        "I am an expert mechanic dedicated to keeping your vehicle running smoothly.",
+        "As an auto repair specialist, I offer comprehensive services for all vehicle types.",
+        "With my professional repair services, I ensure your vehicle gets reliable and efficient repairs.",
+        "As a car maintenance technician, I provide top-quality service to keep your car in top condition.",
+        "I am a master in automotive repair, committed to delivering the best care for your vehicle.",
+    ),
+))
+
+register(Service(
+    slug="makeup",
+    route="/makeup",
+    template="makeup.html",
+    heading_key="makeupHeadings",
+    description_key="makeupDescriptions",
+    headings=(
+        "Makeup Artist Expert",
+        "Beauty Specialist",
+        "Professional Makeup Artist",
+        "Makeup Technician",
+        "Beauty Master",
+    ),
+    descriptions=(
+        "I am an expert makeup artist, here to enhance your beauty for any occasion.",
+        "As a beauty specialist, I provide professional makeup services tailored to your style.",
+        "With my expertise, I ensure you look stunning with flawless makeup applications.",
+        "As a dedicated makeup technician, I offer top-quality makeup services to make you feel beautiful.",
+        "I am a master in makeup artistry, committed to making you look and feel your best.",
+    ),
+))
+
+register(Service(
+    slug="oilchange",
+    route="/oilchange",
+    template="oil_change.html",
+    heading_key="oilChangeHeadings",
+    description_key="oilChangeDescriptions",
+    headings=(
+        "Oil Change Expert",
+        "Lubrication Specialist",
+        "Oil Change Professional",
+        "Oil Change Technician",
+        "Oil Change Master",
+    ),
+    descriptions=(
+        "I am an expert in oil changes, ensuring your engine runs smoothly and efficiently.",
+        "As a lubrication specialist, I offer quick and reliable oil change services.",
+        "With my professional oil change services, I keep your vehicle in top condition.",
+        "As a dedicated oil change technician, I provide top-quality maintenance for your engine.",
+        "I am a master in oil changes, committed to delivering the best service for your vehicle.",
+    ),
+))
+
+register(Service(
+    slug="trainer",
+    route="/personaltraining",
+    template="personal_training.html",
+    heading_key="personalTrainingHeadings",
+    description_key="personalTrainingDescriptions",
+    headings=(
+        "Personal Trainer Expert",
+        "Fitness Specialist",
+        "Professional Personal Trainer",
+        "Fitness Technician",
+        "Personal Training Master",
+    ),
+    descriptions=(
+        "I am an expert personal trainer, dedicated to helping you achieve your fitness goals.",
+        "As a fitness specialist, I provide personalized training programs tailored to your needs.",
+        "With my professional guidance, I ensure you stay motivated and reach your fitness milestones.",
+        "As a fitness technician, I offer effective and safe workouts designed for optimal results.",
+        "I am a master in personal training, committed to helping you achieve optimal health and wellness.",
+    ),
+))
+
+register(Service(
+    slug="plumbing",
+    route="/plumbing",
+    template="plumbing.html",
+    heading_key="plumbingHeadings",
+    description_key="plumbingDescriptions",
+    headings=(
+        "Plumber Expert",
+        "Plumbing Specialist",
+        "Professional Plumber",
+        "Plumbing Technician",
+        "Plumbing Master",
+    ),
+    descriptions=(
+        "I am an expert plumber, here to solve all your plumbing issues efficiently.",
+        "As a plumbing specialist, I provide reliable and comprehensive plumbing services.",
+        "With my professional plumbing services, I ensure high-quality repairs and installations.",
+        "As a dedicated plumbing technician, I keep your plumbing systems functioning smoothly.",
+        "I am a master plumber, committed to delivering top-quality plumbing solutions for your needs.",
+    ),
+))
+
+register(Service(
+    slug="tutor",
+    route="/tutor",
+    template="tutor.html",
+    heading_key="tutorHeadings",
+    description_key="tutorDescriptions",
+    headings=(
+        "Tutor Expert",
+        "Education Specialist",
+        "Professional Tutor",
+        "Learning Technician",
+        "Tutoring Master",
+    ),
+    descriptions=(
+        "I am an expert tutor, dedicated to enhancing your learning experience.",
+        "As an education specialist, I provide personalized tutoring plans tailored to your needs.",
+        "With my professional tutoring services, I ensure effective and reliable learning sessions.",
+        "As a learning technician, I help you achieve your academic goals with customized lessons.",
+        "I am a master tutor, committed to helping you succeed in your studies with top-quality tutoring.",
+    ),
+))
+
+register(Service(
+    slug="lawncare",
+    route="/lawncare",
+    template="lawn_care.html",
+    heading_key="lawnCareHeadings",
+    description_key="lawnCareDescriptions",
+    headings=(
+        "Lawn Care Expert",
+        "Gardening Specialist",
+        "Lawn Maintenance Professional",
+        "Lawn Care Technician",
+        "Lawn Care Master",
+    ),
+    descriptions=(
+        "I am an expert in lawn care, dedicated to transforming your lawn into a beautiful space.",
+        "As a gardening specialist, I offer comprehensive lawn maintenance solutions.",
+        "With my professional lawn care services, I ensure a healthy and lush lawn all year round.",
+        "As a lawn care technician, I provide top-quality care to keep your lawn well-maintained.",
+        "I am a master in lawn care, committed to creating stunning outdoor spaces for you to enjoy.",
+    ),
+))
+
+register(Service(
+    slug="electrician",
+    route="/electrician",
+    template="electrician.html",
+    heading_key="electricianHeadings",
+    description_key="electricianDescriptions",
+    headings=(
+        "Electrician Expert",
+        "Electrical Specialist",
+        "Professional Electrician",
+        "Electrical Technician",
+        "Electrical Master",
+    ),
+    descriptions=(
+        "I am an expert electrician, ensuring your electrical systems are safe and efficient.",
+        "As an electrical specialist, I provide comprehensive services for your home or business.",
+        "With my professional electrical services, I guarantee reliable installations and repairs.",
+        "As a dedicated electrical technician, I ensure your systems are up to code and functioning properly.",
+        "I am a master electrician, committed to delivering top-notch electrical solutions for your needs.",
+    ),
+))
+
+
+def get_service(slug):
+    return SERVICES.get(slug)
+
+
+def persona(service, username):
+    # Derived from the username so a freelancer keeps the same heading, description
+    # and rating on every page view and across processes
+    digest = hashlib.sha256(username.encode("utf-8")).digest()
+    return {
+        service.heading_key: service.headings[digest[0] % len(service.headings)],
+        service.description_key: service.descriptions[digest[1] % len(service.descriptions)],
+        "rating": RATINGS[digest[2] % len(RATINGS)],
+    }
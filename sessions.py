@@ -0,0 +1,49 @@
+import logging
+import os
+import secrets
+import time
+from jose import jwt, JWTError
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+SECRET = os.getenv("SESSION_SECRET")
+if not SECRET:
+    # Tokens from a per-process secret do not survive restarts or work across replicas,
+    # so only a local run that opts in with SESSION_INSECURE_DEV=1 may start without one
+    if os.getenv("SESSION_INSECURE_DEV") != "1":
+        raise RuntimeError("SESSION_SECRET is not set; set it, or SESSION_INSECURE_DEV=1 for local development")
+    logger.warning("SESSION_SECRET is not set, using a random per-process secret")
+    SECRET = secrets.token_urlsafe(32)
+
+USER_SESSION_MAX_AGE = int(os.getenv("USER_SESSION_MAX_AGE", str(30 * 24 * 60 * 60)))
+ADMIN_SESSION_MAX_AGE = int(os.getenv("ADMIN_SESSION_MAX_AGE", str(8 * 60 * 60)))
+
+# Recently verified tokens, so repeat requests skip the signature check
+_verified = TTLCache(
+    maxsize=int(os.getenv("SESSION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("SESSION_CACHE_TTL", "60")),
+)
+
+
+def issue_token(subject, role, max_age, claims=None):
+    now = int(time.time())
+    payload = {**(claims or {}), "sub": subject, "role": role, "iat": now, "exp": now + max_age}
+    return jwt.encode(payload, SECRET, algorithm=ALGORITHM)
+
+
+def verify_token(token, role):
+    # Returns the token's claims, or None if it is forged, expired or for another role
+    if not token:
+        return None
+    claims = _verified.get(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        _verified.set(token, claims)
+    if claims.get("role") != role or claims.get("exp", 0) <= time.time():
+        return None
+    return claims
@@ -0,0 +1,26 @@
+// "Near me" on the category pages: reloads the page with the visitor's coordinates,
+// which makes the server list the nearest providers first.
+document.addEventListener('DOMContentLoaded', function() {
+    const button = document.getElementById('nearMe');
+    if (!button || !navigator.geolocation) {
+        if (button) button.style.display = 'none';
+        return;
+    }
+    const params = new URLSearchParams(window.location.search);
+    if (params.has('lat') && params.has('lng')) {
+        button.textContent = 'Show all providers';
+        button.addEventListener('click', function() {
+            window.location.search = '';
+        });
+        return;
+    }
+    button.addEventListener('click', function() {
+        navigator.geolocation.getCurrentPosition(function(position) {
+            params.set('lat', position.coords.latitude.toFixed(5));
+            params.set('lng', position.coords.longitude.toFixed(5));
+            window.location.search = params.toString();
+        }, function() {
+            alert('Could not get your location.');
+        });
+    });
+});
@@ -0,0 +1,40 @@
+import pytest
+import assets
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def both(monkeypatch):
+    monkeypatch.setattr(assets, "ENCODINGS", [("br", ".br"), ("gzip", ".gz")])
+
+def test_choose_encoding_prefers_brotli(both):
+    assert assets.choose_encoding("gzip, deflate, br", ["br", "gzip"]) == "br"
+
+def test_choose_encoding_falls_back_to_what_exists(both):
+    """Only variants that were built can be served"""
+    assert assets.choose_encoding("gzip, br", ["gzip"]) == "gzip"
+    assert assets.choose_encoding("gzip, br", []) is None
+
+@pytest.mark.parametrize("header", [None, "", "identity", "deflate", "gzip;q=0, br;q=0"])
+def test_choose_encoding_nothing_acceptable(both, header):
+    assert assets.choose_encoding(header, ["br", "gzip"]) is None
+
+def test_choose_encoding_parses_parameters(both):
+    """q-values are stripped and q=0 is a refusal"""
+    assert assets.choose_encoding("br;q=0, gzip;q=0.8", ["br", "gzip"]) == "gzip"
+    assert assets.choose_encoding(" GZIP ; q=1", ["gzip"]) == "gzip"
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+    ('"abcd"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_matches(header, expected):
+    """If-None-Match uses weak comparison and accepts lists and *"""
+    assert assets.etag_matches(header, '"abc"') is expected
@@ -0,0 +1,61 @@
+import pytest
+import cache
+from cache import TTLCache
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_entry_expires_after_ttl(clock):
+    """Entries are served until their TTL runs out, then counted as misses"""
+    listings = TTLCache(maxsize=4, ttl=60)
+    listings.set("carwash", ["bob"])
+    clock[0] += 59
+    assert listings.get("carwash") == ["bob"]
+    clock[0] += 1
+    assert listings.get("carwash") is None
+    assert listings.stats()["hits"] == 1
+    assert listings.stats()["misses"] == 1
+    assert listings.stats()["size"] == 0
+
+def test_set_refreshes_ttl(clock):
+    """Setting a key again restarts its TTL"""
+    listings = TTLCache(maxsize=4, ttl=60)
+    listings.set("carwash", ["bob"])
+    clock[0] += 50
+    listings.set("carwash", ["bob", "alice"])
+    clock[0] += 50
+    assert listings.get("carwash") == ["bob", "alice"]
+
+def test_invalidate_removes_one_key(clock):
+    """invalidate drops only the given key, and unknown keys are ignored"""
+    listings = TTLCache(maxsize=4, ttl=60)
+    listings.set("carwash", ["bob"])
+    listings.set("plumbing", ["alice"])
+    listings.invalidate("carwash")
+    listings.invalidate("missing")
+    assert listings.get("carwash") is None
+    assert listings.get("plumbing") == ["alice"]
+
+def test_clear_removes_everything(clock):
+    listings = TTLCache(maxsize=4, ttl=60)
+    listings.set("carwash", ["bob"])
+    listings.set("plumbing", ["alice"])
+    listings.clear()
+    assert listings.stats()["size"] == 0
+
+def test_least_recently_used_is_evicted(clock):
+    """Past maxsize the entry read longest ago goes first"""
+    listings = TTLCache(maxsize=2, ttl=60)
+    listings.set("carwash", ["bob"])
+    listings.set("plumbing", ["alice"])
+    listings.get("carwash")
+    listings.set("tutor", ["carol"])
+    assert listings.get("plumbing") is None
+    assert listings.get("carwash") == ["bob"]
+    assert listings.get("tutor") == ["carol"]
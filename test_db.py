@@ -0,0 +1,281 @@
+import asyncio
+import base64
+import json
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from bson import ObjectId
+import db
+
+pytestmark = pytest.mark.unit
+
+
+def slot_times(window):
+    return [slot.strftime("%H:%M") for slot in window["slots"]]
+
+def test_booking_window_aligned_start():
+    """A booking on a slot boundary holds exactly the slots it covers"""
+    window = db.booking_window("2026-01-01", "10:00", 60)
+    assert window["start"] == datetime(2026, 1, 1, 10, 0)
+    assert window["end"] == datetime(2026, 1, 1, 11, 0)
+    assert window["durationMinutes"] == 60
+    assert slot_times(window) == ["10:00", "10:30"]
+
+@pytest.mark.parametrize("service_time, duration", [("10:15", 60), ("10:00:45", 60), ("10:00", 45), ("10:00", 1)])
+def test_booking_window_rejects_off_grid_times(service_time, duration):
+    """Starts and durations must fall on slot boundaries, so slots match the real range"""
+    with pytest.raises(ValueError):
+        db.booking_window("2026-01-01", service_time, duration)
+
+def test_booking_window_overlapping_bookings_share_a_slot():
+    """Overlapping bookings collide on at least one slot, back-to-back ones do not"""
+    first = set(db.booking_window("2026-01-01", "10:00", 60)["slots"])
+    overlapping = set(db.booking_window("2026-01-01", "10:30", 60)["slots"])
+    adjacent = set(db.booking_window("2026-01-01", "11:00", 30)["slots"])
+    assert first & overlapping
+    assert not first & adjacent
+
+def test_booking_window_crosses_midnight():
+    """Slots run into the next day"""
+    window = db.booking_window("2025-12-31", "23:30", 60)
+    assert window["slots"] == [datetime(2025, 12, 31, 23, 30), datetime(2026, 1, 1, 0, 0)]
+
+def test_booking_window_default_duration():
+    """Without a duration the booking lasts BOOKING_DEFAULT_MINUTES"""
+    window = db.booking_window("2026-01-01", "10:00")
+    assert window["end"] - window["start"] == timedelta(minutes=db.BOOKING_DEFAULT_MINUTES)
+
+def test_booking_window_accepts_zero_seconds():
+    """Times from a browser may carry seconds"""
+    assert db.booking_window("2026-01-01", "10:30:00", 30)["start"] == datetime(2026, 1, 1, 10, 30)
+
+def test_booking_window_max_duration():
+    """Durations are capped at BOOKING_MAX_MINUTES and must be positive"""
+    db.booking_window("2026-01-01", "08:00", db.BOOKING_MAX_MINUTES)
+    for duration in (0, -30, db.BOOKING_MAX_MINUTES + db.BOOKING_SLOT_MINUTES):
+        with pytest.raises(ValueError):
+            db.booking_window("2026-01-01", "08:00", duration)
+
+@pytest.mark.parametrize("service_date, service_time", [
+    ("2026-13-01", "10:00"),
+    ("01/02/2026", "10:00"),
+    ("tomorrow", "10:00"),
+    ("2026-01-01", "25:00"),
+    ("2026-01-01", "noon"),
+    ("2026-01-01", ""),
+    ("2026-01-01", None),
+    ("2026-01-01", "13:00+05:00"),
+    ("2026-01-01", "13:00Z"),
+])
+def test_booking_window_rejects_bad_input(service_date, service_time):
+    """Malformed dates and times, and times with a UTC offset, are a ValueError (a 400)"""
+    with pytest.raises(ValueError):
+        db.booking_window(service_date, service_time)
+
+def test_provider_availability_rejects_bad_ranges():
+    """Reversed and over-long ranges are refused before any query runs"""
+    with pytest.raises(ValueError):
+        asyncio.run(db.provider_availability("bob", date(2026, 1, 5), date(2026, 1, 1)))
+    with pytest.raises(ValueError):
+        end = date(2026, 1, 1) + timedelta(days=db.AVAILABILITY_MAX_DAYS)
+        asyncio.run(db.provider_availability("bob", date(2026, 1, 1), end))
+
+def test_cursor_round_trip():
+    """Admin and notification cursors decode back to the same ObjectId"""
+    object_id = ObjectId()
+    assert db.decode_cursor(db.encode_cursor(object_id)) == object_id
+
+@pytest.mark.parametrize("token", ["not-a-cursor", "", "!!!!"])
+def test_decode_cursor_rejects_garbage(token):
+    """Tampered cursors are a ValueError (a 400)"""
+    with pytest.raises(ValueError):
+        db.decode_cursor(token)
+
+@pytest.mark.parametrize("value", [0, 25, 12.5])
+def test_search_cursor_round_trip(value):
+    """Search and near-me cursors keep their sort value and ObjectId"""
+    object_id = ObjectId()
+    assert db.decode_search_cursor(db.encode_search_cursor(value, object_id)) == (value, object_id)
+
+def raw_search_cursor(value, object_id):
+    return base64.urlsafe_b64encode(json.dumps([value, object_id]).encode()).decode().rstrip("=")
+
+@pytest.mark.parametrize("value", ["abc", True, None, [1], {"$gt": 0}])
+def test_decode_search_cursor_rejects_non_numeric_values(value):
+    """The sort value must be a number before it reaches a rate comparison or $geoNear"""
+    with pytest.raises(ValueError):
+        db.decode_search_cursor(raw_search_cursor(value, str(ObjectId())))
+
+@pytest.mark.parametrize("token", ["garbage", raw_search_cursor(5, "not-an-id"), raw_search_cursor(5, 7)])
+def test_decode_search_cursor_rejects_garbage(token):
+    """Undecodable tokens and bad ObjectIds are a ValueError"""
+    with pytest.raises(ValueError):
+        db.decode_search_cursor(token)
+
+def test_location_point_is_longitude_first():
+    """GeoJSON orders coordinates [longitude, latitude]"""
+    assert db.location_point(51.5, -0.12) == {"type": "Point", "coordinates": [-0.12, 51.5]}
+    assert db.location_point(-90, 180) == {"type": "Point", "coordinates": [180, -90]}
+    assert db.location_point(None, None) is None
+
+@pytest.mark.parametrize("latitude, longitude", [(51.5, None), (None, -0.12), (90.1, 0), (-91, 0), (0, 180.5), (0, -181), (float("nan"), 0), (0, float("inf"))])
+def test_location_point_rejects_partial_or_out_of_range(latitude, longitude):
+    """One coordinate alone or one off the globe is a ValueError (a 400)"""
+    with pytest.raises(ValueError):
+        db.location_point(latitude, longitude)
+
+def test_service_date_range_is_inclusive_iso_strings():
+    """Booking exports compare serviceDate as YYYY-MM-DD strings"""
+    assert db._service_date_range(date(2026, 1, 1), date(2026, 1, 31)) == {"$gte": "2026-01-01", "$lte": "2026-01-31"}
+    assert db._service_date_range(None, date(2026, 1, 31)) == {"$lte": "2026-01-31"}
+    assert db._service_date_range() == {}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=None):
+        # Either sort(key, direction) or sort([(key, direction), ...]) with one direction
+        keys = [(key, direction)] if direction is not None else key
+        reverse = keys[0][1] == -1
+        self.docs = sorted(self.docs, key=lambda doc: [doc[name] for name, _ in keys], reverse=reverse)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def hint(self, index):
+        return self
+
+    def __aiter__(self):
+        async def iterate():
+            for doc in self.docs:
+                yield dict(doc)
+        return iterate()
+
+class FakeNotifications:
+    # Enough of a Motor collection for get_notifications
+    def __init__(self):
+        self.docs = []
+
+    def insert(self, object_id):
+        self.docs.append({"_id": object_id, "providerUsername": "bob", "details": {}, "read": False})
+
+    def find(self, query, projection):
+        lower = query.get("_id", {}).get("$gte")
+        return FakeCursor([doc for doc in self.docs if doc["providerUsername"] == query["providerUsername"] and (lower is None or doc["_id"] >= lower)])
+
+def object_id_at(moment, suffix):
+    # An ObjectId with the given timestamp; the suffix stands in for the per-process random bytes
+    return ObjectId(f"{int(moment.timestamp()):08x}{suffix:016x}")
+
+def test_feed_returns_notification_that_sorts_below_the_last_one_sent(monkeypatch):
+    """A later insert from another worker with a lower _id in the same second is still delivered, once"""
+    notifications = FakeNotifications()
+    monkeypatch.setattr(db, "notification_collection", notifications)
+    moment = datetime.now(timezone.utc).replace(microsecond=0)
+    first = object_id_at(moment, 0xFF)
+    notifications.insert(first)
+    items, cursor = asyncio.run(db.get_notifications("bob"))
+    assert [item["_id"] for item in items] == [str(first)]
+
+    late = object_id_at(moment, 0x01)
+    notifications.insert(late)
+    items, cursor = asyncio.run(db.get_notifications("bob", since=cursor))
+    assert [item["_id"] for item in items] == [str(late)]
+
+    items, cursor = asyncio.run(db.get_notifications("bob", since=cursor))
+    assert items == []
+
+def test_feed_cursor_forgets_ids_outside_the_overlap_window():
+    """Seen ids older than the window behind the newest are dropped"""
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    old = object_id_at(now - timedelta(seconds=db.NOTIFICATION_OVERLAP_SECONDS + 5), 1)
+    new = object_id_at(now, 1)
+    cursor = db.advance_feed_cursor(db.new_feed_cursor(), [str(old), str(new)])
+    floor, seen = db.decode_feed_cursor(cursor)
+    assert seen == {new}
+    assert floor == now - timedelta(seconds=db.NOTIFICATION_OVERLAP_SECONDS)
+    assert db.feed_cursor_has(cursor, new) and not db.feed_cursor_has(cursor, old)
+
+def test_feed_cursor_caps_the_seen_ids(monkeypatch):
+    """A burst larger than the cap keeps only the newest ids"""
+    monkeypatch.setattr(db, "NOTIFICATION_CURSOR_MAX_IDS", 3)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    ids = [object_id_at(now - timedelta(seconds=4 - i), 1) for i in range(5)]
+    floor, seen = db.decode_feed_cursor(db.advance_feed_cursor(db.new_feed_cursor(), [str(i) for i in ids]))
+    assert seen == set(ids[-3:])
+    assert floor == ids[-3].generation_time
+
+def raw_feed_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+@pytest.mark.parametrize("token", [
+    "garbage",
+    raw_feed_cursor([True, []]),
+    raw_feed_cursor(["1700000000", []]),
+    raw_feed_cursor([1700000000, "ids"]),
+    raw_feed_cursor([1700000000, ["not-an-id"]]),
+    raw_feed_cursor([10**20, []]),
+])
+def test_decode_feed_cursor_rejects_garbage(token):
+    """Tampered feed cursors are a ValueError (a 400)"""
+    with pytest.raises(ValueError):
+        db.decode_feed_cursor(token)
+
+
+class FakeFreelancers:
+    # Enough of a Motor collection for get_freelancers_by_service
+    def __init__(self, name, docs):
+        self.name = name
+        self.docs = docs
+
+    def find(self, query, projection):
+        return FakeCursor([doc for doc in self.docs if doc["serviceType"] == query["serviceType"]])
+
+def test_listing_cache_refills_from_the_primary(monkeypatch):
+    """A cache refill never reads the lagging secondary, uncached projections may"""
+    primary = FakeFreelancers("Freelancers", [{"username": "bob", "serviceType": "carwash", "hourlyrate": 30}])
+    lagging = FakeFreelancers("Freelancers", [{"username": "bob", "serviceType": "carwash", "hourlyrate": 20}])
+    monkeypatch.setattr(db, "freelancer_collection", primary)
+    monkeypatch.setattr(db, "_stale_collections", {"Freelancers": lagging})
+    monkeypatch.setattr(db.service_registry, "get_service", lambda service_type: {})
+    monkeypatch.setattr(db.service_registry, "persona", lambda service, username: {})
+    db.listing_cache.invalidate("carwash")
+    try:
+        listings = asyncio.run(db.get_freelancers_by_service("carwash"))
+        assert [doc["hourlyrate"] for doc in listings] == [30]
+        assert db.listing_cache.get("carwash") == listings
+        other = asyncio.run(db.get_freelancers_by_service("carwash", projection={"username": 1}))
+        assert [doc["hourlyrate"] for doc in other] == [20]
+    finally:
+        db.listing_cache.invalidate("carwash")
+
+
+class FakeSearch:
+    # Records the search query and answers it with numeric-rate listings only
+    def __init__(self, docs):
+        self.name = "Freelancers"
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if isinstance(doc.get("hourlyrate"), (int, float))])
+
+def test_search_skips_listings_without_a_numeric_rate(monkeypatch):
+    """Every search filters on a numeric hourlyrate, so the next-page cursor always decodes"""
+    search = FakeSearch([
+        {"_id": ObjectId(), "username": "a", "hourlyrate": 10},
+        {"_id": ObjectId(), "username": "b"},
+        {"_id": ObjectId(), "username": "c", "hourlyrate": 20},
+    ])
+    monkeypatch.setattr(db, "freelancer_collection", search)
+    monkeypatch.setattr(db, "_stale_collections", {"Freelancers": search})
+    items, token = asyncio.run(db.search_freelancers(limit=1))
+    assert [item["username"] for item in items] == ["a"]
+    assert db.decode_search_cursor(token)[0] == 10
+    asyncio.run(db.search_freelancers(text="smith", after=token, limit=1))
+    assert all(query["hourlyrate"]["$type"] == "number" for query in search.queries)
+    assert search.queries[1]["hourlyrate"]["$gte"] == 10
@@ -0,0 +1,42 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+import pytest
+import exports
+
+pytestmark = pytest.mark.unit
+
+
+async def docs(*items):
+    for item in items:
+        yield item
+
+async def collect(rows):
+    return [row async for row in rows]
+
+def test_csv_rows_writes_header_then_one_chunk_per_row():
+    """The header comes first, and each document is its own chunk"""
+    chunks = asyncio.run(collect(exports.csv_rows(docs({"a": 1, "b": 2}, {"a": 3, "b": 4}), ["a", "b"])))
+    assert chunks == ["a,b\r\n", "1,2\r\n", "3,4\r\n"]
+
+def test_csv_rows_ignores_extra_and_blanks_missing_fields():
+    """Fields outside the column list are dropped and missing ones are empty"""
+    chunks = asyncio.run(collect(exports.csv_rows(docs({"a": 1, "secret": "x"}), ["a", "b"])))
+    assert chunks[1] == "1,\r\n"
+
+def test_csv_rows_quotes_commas_and_newlines():
+    """Free-text fields round-trip through a CSV reader"""
+    note = 'Gate code 12, "back door"\nCall first'
+    body = "".join(asyncio.run(collect(exports.csv_rows(docs({"additionalNotes": note}), ["additionalNotes"]))))
+    assert list(csv.DictReader(io.StringIO(body))) == [{"additionalNotes": note}]
+
+def test_csv_rows_with_no_documents_is_just_the_header():
+    assert asyncio.run(collect(exports.csv_rows(docs(), ["a"]))) == ["a\r\n"]
+
+def test_ndjson_rows_one_document_per_line():
+    """Each line is a JSON document, with non-JSON values stringified"""
+    lines = asyncio.run(collect(exports.ndjson_rows(docs({"a": 1}, {"start": datetime(2026, 1, 1, 10, 0)}))))
+    assert [json.loads(line) for line in lines] == [{"a": 1}, {"start": "2026-01-01 10:00:00"}]
+    assert all(line.endswith("\n") for line in lines)
@@ -0,0 +1,61 @@
+import asyncio
+import time
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+import health
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(autouse=True)
+def state(monkeypatch, tmp_path):
+    monkeypatch.setattr(health, "mongo_ok", True)
+    monkeypatch.setattr(health, "last_ping", time.monotonic())
+    monkeypatch.setattr(health, "last_error", None)
+    monkeypatch.setattr(health, "draining", False)
+    monkeypatch.setattr(health, "DRAIN_FILE", str(tmp_path / "draining"))
+    return tmp_path
+
+def test_ready_with_a_fresh_ping():
+    ready, details = health.readiness()
+    assert ready and details["ready"] and not details["draining"]
+
+def test_not_ready_before_the_first_ping(monkeypatch):
+    monkeypatch.setattr(health, "last_ping", None)
+    ready, details = health.readiness()
+    assert not ready and details["ping_age_seconds"] is None
+
+def test_not_ready_when_mongo_is_down(monkeypatch):
+    monkeypatch.setattr(health, "mongo_ok", False)
+    assert not health.readiness()[0]
+
+def test_not_ready_when_the_ping_is_stale(monkeypatch):
+    """A stuck pinger fails readiness even if its last result was good"""
+    monkeypatch.setattr(health, "last_ping", time.monotonic() - health.STALE_AFTER - 1)
+    assert not health.readiness()[0]
+
+def test_not_ready_while_draining(monkeypatch, state):
+    """Either the flag or the preStop drain file takes the pod out of rotation"""
+    monkeypatch.setattr(health, "draining", True)
+    ready, details = health.readiness()
+    assert not ready and details["draining"]
+    monkeypatch.setattr(health, "draining", False)
+    (state / "draining").touch()
+    ready, details = health.readiness()
+    assert not ready and details["draining"]
+
+class FailingAdmin:
+    async def command(self, name):
+        raise ServerSelectionTimeoutError("no servers")
+
+class FailingClient:
+    admin = FailingAdmin()
+
+def test_ping_loop_records_failures(monkeypatch):
+    async def stop(seconds):
+        raise asyncio.CancelledError
+    monkeypatch.setattr(health.asyncio, "sleep", stop)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(health.ping_loop(FailingClient()))
+    ready, details = health.readiness()
+    assert not ready and not details["mongo"] and "no servers" in details["error"]
@@ -0,0 +1,65 @@
+import os
+import pytest
+from PIL import Image
+import images
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    (static / "uploads").mkdir(parents=True)
+    monkeypatch.setattr(images, "STATIC_DIR", str(static))
+    monkeypatch.setattr(images, "CACHE_DIR", str(tmp_path / "cache"))
+    return static
+
+@pytest.mark.parametrize("path", [
+    "../main.py",
+    "../static/images/man.png",
+    "images/../../secret.png",
+    "/etc/passwd.png",
+    "..",
+    "images/man.txt",
+    "images/man",
+])
+def test_source_path_refuses_escapes_and_non_images(path):
+    """Paths outside static/ and non-image extensions are a ValueError (a 400)"""
+    with pytest.raises(ValueError):
+        images._source_path(path)
+
+def test_source_path_normalizes_inside_static():
+    assert images._source_path("images/./sub/../man.PNG") == ("images/man.PNG", os.path.join(images.STATIC_DIR, "images/man.PNG"))
+
+def test_derivative_renders_and_reuses(dirs):
+    """A derivative is scaled to the width and reused while the original is unchanged"""
+    Image.new("RGB", (800, 400), "red").save(dirs / "uploads" / "wide.png")
+    target = images._derivative("uploads/wide.png", 320, "webp")
+    with Image.open(target) as rendered:
+        assert rendered.size == (320, 160)
+    mtime = os.stat(target).st_mtime_ns
+    assert images._derivative("uploads/wide.png", 320, "webp") == target
+    assert os.stat(target).st_mtime_ns == mtime
+
+def test_unsupported_width_or_format(dirs):
+    Image.new("RGB", (10, 10)).save(dirs / "uploads" / "small.png")
+    with pytest.raises(ValueError):
+        images._derivative("uploads/small.png", 333, "webp")
+    with pytest.raises(ValueError):
+        images._derivative("uploads/small.png", 320, "bmp")
+
+def test_missing_original(dirs):
+    with pytest.raises(FileNotFoundError):
+        images._derivative("uploads/missing.png", 320, "webp")
+
+def test_corrupt_original_is_unreadable(dirs):
+    """Bytes that are not an image become UnreadableImage (a 415), not an OSError"""
+    (dirs / "uploads" / "bad.jpg").write_bytes(b"123456789")
+    with pytest.raises(images.UnreadableImage):
+        images._derivative("uploads/bad.jpg", 320, "webp")
+
+def test_decompression_bomb_is_unreadable(dirs, monkeypatch):
+    Image.new("RGB", (100, 100)).save(dirs / "uploads" / "bomb.png")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(images.UnreadableImage):
+        images._derivative("uploads/bomb.png", 320, "webp")
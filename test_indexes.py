@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from pymongo.errors import OperationFailure
+import indexes
+
+pytestmark = pytest.mark.unit
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    async def create_indexes(self, models):
+        for model in models:
+            error = self.database.create_errors.get(model.document["name"])
+            if error:
+                raise error
+            self.database.created.append(model.document["name"])
+
+    async def drop_index(self, name):
+        if name not in self.database.existing:
+            raise OperationFailure("index not found", code=27)
+        self.database.dropped.append(name)
+
+
+class FakeDatabase:
+    def __init__(self, create_errors=None, existing=()):
+        self.create_errors = create_errors or {}
+        self.existing = set(existing)
+        self.created = []
+        self.dropped = []
+        self.commands = []
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+    async def command(self, command):
+        self.commands.append(command)
+
+
+def test_plan_stages_walks_nested_plans():
+    """Stages are found inside inputStage, inputStages and nested lists"""
+    plan = {
+        "stage": "FETCH",
+        "inputStage": {
+            "stage": "OR",
+            "inputStages": [
+                {"stage": "IXSCAN", "indexName": "serviceType_hourlyrate"},
+                {"stage": "COLLSCAN"},
+            ],
+        },
+    }
+    assert list(indexes._plan_stages(plan)) == ["FETCH", "OR", "IXSCAN", "COLLSCAN"]
+
+def test_plan_stages_of_empty_plan():
+    assert list(indexes._plan_stages({})) == []
+
+def test_one_failing_index_does_not_block_the_others():
+    """A duplicate-key failure on username_unique still builds every other index"""
+    database = FakeDatabase({"username_unique": OperationFailure("E11000 duplicate key", code=11000)})
+    failed = asyncio.run(indexes.ensure_indexes(database))
+    assert failed == ["username_unique"]
+    assert "serviceType_hourlyrate" in database.created
+    assert "location_2dsphere" in database.created
+
+def test_changed_ttl_is_applied_with_collmod():
+    """An IndexOptionsConflict on the TTL index becomes a collMod, not a failure"""
+    database = FakeDatabase({"createdAt_ttl": OperationFailure("IndexOptionsConflict", code=85)})
+    failed = asyncio.run(indexes.ensure_indexes(database))
+    assert failed == []
+    assert database.commands == [{
+        "collMod": "Notifications",
+        "index": {"name": "createdAt_ttl", "expireAfterSeconds": indexes.NOTIFICATION_TTL_SECONDS},
+    }]
+
+def test_replaced_indexes_are_dropped():
+    """Superseded indexes are dropped when present and skipped when already gone"""
+    database = FakeDatabase(existing={"serviceType"})
+    asyncio.run(indexes.ensure_indexes(database))
+    assert database.dropped == ["serviceType"]
@@ -0,0 +1,45 @@
+import logging
+import queue
+import pytest
+import logs
+
+pytestmark = pytest.mark.unit
+
+
+def record(name, level=logging.INFO):
+    return logging.LogRecord(name, level, __file__, 1, "message", None, None)
+
+def test_sampling_keeps_warnings_and_errors(monkeypatch):
+    """Sampling never drops WARNING and above"""
+    monkeypatch.setattr(logs.random, "random", lambda: 0.99)
+    sampler = logs.SamplingFilter({"uvicorn.access": 0.0})
+    assert sampler.filter(record("uvicorn.access", logging.WARNING))
+    assert sampler.filter(record("uvicorn.access", logging.ERROR))
+    assert not sampler.filter(record("uvicorn.access"))
+
+def test_sampling_uses_the_rate(monkeypatch):
+    sampler = logs.SamplingFilter({"noisy": 0.1})
+    monkeypatch.setattr(logs.random, "random", lambda: 0.05)
+    assert sampler.filter(record("noisy"))
+    monkeypatch.setattr(logs.random, "random", lambda: 0.1)
+    assert not sampler.filter(record("noisy"))
+
+def test_sampling_matches_the_nearest_parent_logger(monkeypatch):
+    """A child logger inherits its closest configured ancestor's rate"""
+    monkeypatch.setattr(logs.random, "random", lambda: 0.5)
+    sampler = logs.SamplingFilter({"app": 0.0, "app.db": 1.0})
+    assert sampler.filter(record("app.db.query"))
+    assert not sampler.filter(record("app.http"))
+    assert not sampler.filter(record("app"))
+
+def test_sampling_passes_unconfigured_loggers(monkeypatch):
+    monkeypatch.setattr(logs.random, "random", lambda: 0.99)
+    sampler = logs.SamplingFilter({"app": 0.0})
+    assert sampler.filter(record("application"))
+    assert sampler.filter(record("other.app"))
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = logs.DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.enqueue(record("app"))
+    handler.enqueue(record("app"))
+    assert handler.dropped == 1
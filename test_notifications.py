@@ -0,0 +1,97 @@
+import asyncio
+import json
+import pytest
+from bson import ObjectId
+import db
+import notifications
+
+pytestmark = pytest.mark.unit
+
+
+class FakeFeed:
+    # Stands in for db.get_notifications: returns each stored event once
+    def __init__(self, *events):
+        self.pending = list(events)
+        self.calls = 0
+
+    async def __call__(self, username, since=None, limit=db.NOTIFICATION_PAGE_SIZE):
+        self.calls += 1
+        events, self.pending = self.pending, []
+        return events, db.advance_feed_cursor(since, [event["_id"] for event in events])
+
+def event():
+    return {"_id": str(ObjectId()), "details": {"customerName": "Ann"}, "read": False}
+
+def data_ids(chunks):
+    return [json.loads(chunk[len("data: "):])["_id"] for chunk in chunks if chunk.startswith("data: ")]
+
+async def read(stream, count):
+    return [await asyncio.wait_for(stream.__anext__(), 1) for _ in range(count)]
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(notifications, "POLL_SECONDS", 0.01)
+    monkeypatch.setattr(notifications, "KEEPALIVE_SECONDS", 0.05)
+
+def test_change_stream_mode_catches_up_before_forwarding(monkeypatch, fast):
+    """Bookings made before the subscription come from the database, then events flow without repeats"""
+    missed, duplicate, live = event(), event(), event()
+    feed = FakeFeed(missed, duplicate)
+    monkeypatch.setattr(db, "get_notifications", feed)
+    monkeypatch.setattr(notifications, "change_stream_active", True)
+
+    async def scenario():
+        stream = notifications.event_stream("bob", db.new_feed_cursor())
+        chunks = await read(stream, 2)
+        # The watcher relays one the catch-up already sent, then a new one
+        notifications.broker.publish("bob", duplicate)
+        notifications.broker.publish("bob", live)
+        chunks += await read(stream, 1)
+        await stream.aclose()
+        return chunks
+
+    assert data_ids(asyncio.run(scenario())) == [missed["_id"], duplicate["_id"], live["_id"]]
+    assert feed.calls == 1
+
+def test_polling_mode_reads_the_database(monkeypatch, fast):
+    """Without a change stream, events from other workers arrive by polling"""
+    remote = event()
+    feed = FakeFeed()
+    monkeypatch.setattr(db, "get_notifications", feed)
+    monkeypatch.setattr(notifications, "change_stream_active", False)
+
+    async def scenario():
+        stream = notifications.event_stream("bob")
+        task = asyncio.ensure_future(read(stream, 1))
+        await asyncio.sleep(0.03)
+        feed.pending.append(remote)
+        chunks = await task
+        await stream.aclose()
+        return chunks
+
+    assert data_ids(asyncio.run(scenario())) == [remote["_id"]]
+    assert feed.calls >= 2
+
+def test_idle_stream_sends_keepalives(monkeypatch, fast):
+    monkeypatch.setattr(db, "get_notifications", FakeFeed())
+    monkeypatch.setattr(notifications, "change_stream_active", True)
+
+    async def scenario():
+        stream = notifications.event_stream("bob")
+        chunks = await read(stream, 1)
+        await stream.aclose()
+        return chunks
+
+    assert asyncio.run(scenario()) == [": keep-alive\n\n"]
+
+def test_unsubscribes_when_the_client_leaves(monkeypatch, fast):
+    monkeypatch.setattr(db, "get_notifications", FakeFeed(event()))
+    monkeypatch.setattr(notifications, "change_stream_active", False)
+
+    async def scenario():
+        stream = notifications.event_stream("bob")
+        await read(stream, 1)
+        await stream.aclose()
+
+    asyncio.run(scenario())
+    assert notifications.broker.subscriber_count() == 0
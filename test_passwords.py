@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+import passwords
+
+pytestmark = pytest.mark.unit
+
+
+def test_hash_then_check():
+    """A hash from the pool verifies the right password and rejects a wrong one"""
+    hashed = asyncio.run(passwords.hash_password("correct horse"))
+    assert asyncio.run(passwords.check_password("correct horse", hashed))
+    assert not asyncio.run(passwords.check_password("wrong horse", hashed))
+
+def test_saturated_pool_rejects_without_hashing(monkeypatch):
+    """At QUEUE_LIMIT in flight a new call fails fast with PoolSaturated"""
+    monkeypatch.setattr(passwords, "_in_flight", passwords.QUEUE_LIMIT)
+    rejected = passwords.stats()["rejected"]
+    calls = passwords.stats()["calls"]
+    with pytest.raises(passwords.PoolSaturated):
+        asyncio.run(passwords.hash_password("correct horse"))
+    assert passwords.stats()["rejected"] == rejected + 1
+    assert passwords.stats()["calls"] == calls
+
+def test_in_flight_is_released_after_an_error(monkeypatch):
+    """A failing call still frees its place in the queue"""
+    def boom(password):
+        raise RuntimeError("bcrypt failed")
+    monkeypatch.setattr(passwords, "_hash", boom)
+    with pytest.raises(RuntimeError):
+        asyncio.run(passwords.hash_password("correct horse"))
+    assert passwords.stats()["in_flight"] == 0
@@ -0,0 +1,61 @@
+import builtins
+import io
+import pytest
+import serve
+
+pytestmark = pytest.mark.unit
+
+V2 = "/sys/fs/cgroup/cpu.max"
+V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+@pytest.fixture
+def cgroup(monkeypatch):
+    # Serves the given cgroup files; any other cgroup path does not exist
+    files = {}
+    real_open = builtins.open
+
+    def fake_open(path, *args, **kwargs):
+        if str(path).startswith("/sys/fs/cgroup"):
+            if path not in files:
+                raise FileNotFoundError(path)
+            return io.StringIO(files[path])
+        return real_open(path, *args, **kwargs)
+    monkeypatch.setattr(builtins, "open", fake_open)
+    return files
+
+def test_cgroup_v2_quota(cgroup):
+    cgroup[V2] = "150000 100000\n"
+    assert serve._cgroup_cpu_limit() == 1.5
+
+def test_cgroup_v2_unlimited(cgroup):
+    """max means no quota, even if v1 files are also present"""
+    cgroup[V2] = "max 100000\n"
+    cgroup[V1_QUOTA], cgroup[V1_PERIOD] = "200000\n", "100000\n"
+    assert serve._cgroup_cpu_limit() is None
+
+def test_cgroup_v1_quota(cgroup):
+    cgroup[V1_QUOTA], cgroup[V1_PERIOD] = "50000\n", "100000\n"
+    assert serve._cgroup_cpu_limit() == 0.5
+
+def test_cgroup_v1_unlimited(cgroup):
+    cgroup[V1_QUOTA], cgroup[V1_PERIOD] = "-1\n", "100000\n"
+    assert serve._cgroup_cpu_limit() is None
+
+def test_cgroup_unreadable_or_missing(cgroup):
+    """Garbage in v2 falls through to v1; nothing readable means no limit"""
+    cgroup[V2] = "garbage\n"
+    assert serve._cgroup_cpu_limit() is None
+    cgroup[V1_QUOTA], cgroup[V1_PERIOD] = "300000\n", "100000\n"
+    assert serve._cgroup_cpu_limit() == 3
+
+def test_worker_count_rounds_the_quota_up(cgroup, monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(serve.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    cgroup[V2] = "150000 100000\n"
+    assert serve.worker_count() == 2
+    cgroup[V2] = "5000 100000\n"
+    assert serve.worker_count() == 1
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert serve.worker_count() == 3
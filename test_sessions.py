@@ -0,0 +1,59 @@
+import os
+import pytest
+
+# sessions refuses to import without a signing secret
+os.environ.setdefault("SESSION_SECRET", "unit-test-secret")
+
+from jose import jwt
+import sessions
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(autouse=True)
+def empty_verified_cache():
+    sessions._verified.clear()
+    yield
+    sessions._verified.clear()
+
+def test_issued_token_verifies():
+    """A fresh token verifies for its role and carries the extra claims"""
+    token = sessions.issue_token("bob", "freelancer", 60, {"fullname": "Bob"})
+    claims = sessions.verify_token(token, "freelancer")
+    assert claims["sub"] == "bob"
+    assert claims["fullname"] == "Bob"
+
+def test_wrong_role_is_rejected():
+    """A freelancer token is not an admin token, even once cached"""
+    token = sessions.issue_token("bob", "freelancer", 60)
+    assert sessions.verify_token(token, "freelancer") is not None
+    assert sessions.verify_token(token, "admin") is None
+
+def test_expired_token_is_rejected():
+    """Tokens past their exp do not verify"""
+    token = sessions.issue_token("bob", "freelancer", -1)
+    assert sessions.verify_token(token, "freelancer") is None
+
+def test_cached_token_still_expires(monkeypatch):
+    """A token verified before it expired is refused afterwards"""
+    token = sessions.issue_token("bob", "freelancer", 60)
+    assert sessions.verify_token(token, "freelancer") is not None
+    later = sessions.time.time() + 120
+    monkeypatch.setattr(sessions.time, "time", lambda: later)
+    assert sessions.verify_token(token, "freelancer") is None
+
+def test_forged_token_is_rejected():
+    """A token signed with another key does not verify"""
+    forged = jwt.encode({"sub": "bob", "role": "admin", "exp": 2**31}, "another-secret", algorithm=sessions.ALGORITHM)
+    assert sessions.verify_token(forged, "admin") is None
+
+def test_tampered_token_is_rejected():
+    """Changing the payload breaks the signature"""
+    header, payload, signature = sessions.issue_token("bob", "freelancer", 60).split(".")
+    other_payload = sessions.issue_token("alice", "freelancer", 60).split(".")[1]
+    assert sessions.verify_token(".".join([header, other_payload, signature]), "freelancer") is None
+
+@pytest.mark.parametrize("token", [None, "", "not-a-jwt"])
+def test_missing_or_malformed_token_is_rejected(token):
+    """Absent cookies and junk values do not verify"""
+    assert sessions.verify_token(token, "freelancer") is None
@@ -0,0 +1,85 @@
+import asyncio
+import io
+import os
+import pytest
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, UploadFile
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+import uploads
+
+pytestmark = pytest.mark.unit
+
+
+def png_bytes(color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def upload(data, filename="me.png"):
+    return UploadFile(io.BytesIO(data), size=len(data), filename=filename, headers=Headers({"content-type": "image/png"}))
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "STATIC_DIR", str(tmp_path))
+    return tmp_path
+
+def stored_files(static_dir):
+    return sorted(os.listdir(static_dir / uploads.UPLOAD_DIR))
+
+def test_identical_images_share_one_file(static_dir):
+    """Uploads are named by content hash, so a repeat upload reuses the file"""
+    first = asyncio.run(uploads.save_image(upload(png_bytes())))
+    second = asyncio.run(uploads.save_image(upload(png_bytes(), "copy.png")))
+    other = asyncio.run(uploads.save_image(upload(png_bytes("blue"))))
+    assert first == second != other
+    assert first.startswith(f"{uploads.UPLOAD_DIR}/") and first.endswith(".png")
+    assert len(stored_files(static_dir)) == 2
+
+def test_non_image_with_image_name_is_rejected(static_dir):
+    """Bytes Pillow cannot read are refused and nothing is kept"""
+    with pytest.raises(ValueError):
+        asyncio.run(uploads.save_image(upload(b"not a jpg", "bad.jpg")))
+    assert stored_files(static_dir) == []
+
+def test_unsupported_extension_is_rejected(static_dir):
+    with pytest.raises(ValueError):
+        asyncio.run(uploads.save_image(upload(png_bytes(), "me.svg")))
+
+def test_oversized_upload_is_rejected_while_streaming(static_dir, monkeypatch):
+    """The chunk counter stops at the cap even when the size is unknown"""
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 10)
+    big = upload(png_bytes())
+    big.size = None
+    with pytest.raises(uploads.UploadTooLarge):
+        asyncio.run(uploads.save_image(big))
+    assert stored_files(static_dir) == []
+
+async def echo_length(request):
+    return JSONResponse({"length": len(await request.body())})
+
+@pytest.fixture
+def limited_client():
+    app = Starlette(routes=[Route("/upload", echo_length, methods=["POST"])])
+    app.add_middleware(uploads.BodyLimitMiddleware, max_bytes=100)
+    return TestClient(app)
+
+def test_body_within_the_limit_passes(limited_client):
+    response = limited_client.post("/upload", content=b"x" * 100)
+    assert response.status_code == 200
+    assert response.json() == {"length": 100}
+
+def test_declared_length_over_the_limit_is_refused_unread(limited_client):
+    """A Content-Length over the cap gets 413 before the app reads anything"""
+    response = limited_client.post("/upload", content=b"x" * 101)
+    assert response.status_code == 413
+
+def test_chunked_body_over_the_limit_is_cut_off(limited_client):
+    """Without a Content-Length the body is counted as it arrives"""
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 50
+    response = limited_client.post("/upload", content=chunks())
+    assert response.status_code == 413
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+import aiofiles
+import aiofiles.os
+from PIL import Image
+
+# Uploaded files live under static/ so they are served by the /static mount
+STATIC_DIR = "static"
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+# Formats Pillow must recognise in the stored bytes, whatever the file is called
+IMAGE_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+# Whole request bodies are capped before they are parsed: the image plus room for the form fields
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(MAX_UPLOAD_BYTES + 64 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class BodyLimitMiddleware:
+    # Starlette spools the whole multipart body before a handler runs, so the size
+    # limit has to apply here: a declared Content-Length over the cap is refused
+    # unread, and a chunked body is cut off once it passes the cap.
+
+    def __init__(self, app, max_bytes=MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length")
+        try:
+            too_large = length is not None and int(length) > self.max_bytes
+        except ValueError:
+            too_large = False
+        if too_large:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # The app sees a disconnect and stops reading; the 413 is sent below
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body is larger than {self.max_bytes} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _verify_image(path):
+    # Pillow reads the header and checks the structure without decoding every pixel
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        return False
+    return image_format in IMAGE_FORMATS
+
+
+async def save_image(upload):
+    # Streams the upload to disk in chunks, hashing as it goes, and stores it as
+    # <sha256><ext> so identical images share one file and names never collide.
+    # Returns the path relative to static/.
+    ext = os.path.splitext(upload.filename or "")[1].lower()
+    if ext not in IMAGE_EXTENSIONS:
+        raise ValueError("Profile image must be a JPEG, PNG, GIF or WebP file")
+
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"Profile image is larger than {MAX_UPLOAD_BYTES} bytes")
+
+    directory = os.path.join(STATIC_DIR, UPLOAD_DIR)
+    await aiofiles.os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"Profile image is larger than {MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                await out.write(chunk)
+        if not await asyncio.to_thread(_verify_image, temp_path):
+            raise ValueError("Profile image is not a valid JPEG, PNG, GIF or WebP image")
+        name = f"{digest.hexdigest()}{ext}"
+        final_path = os.path.join(directory, name)
+        if await aiofiles.os.path.exists(final_path):
+            await aiofiles.os.remove(temp_path)
+        else:
+            await aiofiles.os.replace(temp_path, final_path)
+    except BaseException:
+        if await aiofiles.os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+        raise
+    return f"{UPLOAD_DIR}/{name}"